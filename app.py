@@ -1,12 +1,29 @@
-import streamlit as st
-import requests
-import json
-import pandas as pd
-from docx import Document
-import io
 import time
-import concurrent.futures
+SCRIPT_STARTED = time.perf_counter() # Before the imports, so a cold start's import time is measured
+
+import streamlit as st
+import os
+import functools
 import math
+import threading
+import bisect
+from translation_cache import TranslationCache
+from translation_memory import TranslationMemory
+from scheduler import RequestScheduler
+from chunker import DEFAULT_TOKEN_BUDGET, split_text_incrementally
+from checkpoints import JobStore
+from jobs import ACTIVE_STATES, JobRunner
+from pipeline import MODELS, HttpClient, build_rows
+from row_store import RowStore
+from routing import ModelRouter
+from key_pool import ApiKeyPool
+from prompts import DEFAULT_PROMPT
+from ingest import OLE_MAGIC, detect_format, extract_text
+from exporters import EXPORT_FORMATS, export_rows
+from subtitle_rules import PROBLEM_LABELS
+from metrics import summarize, to_jsonl
+from styles import APP_CSS
+IMPORTS_DONE = time.perf_counter()
 
 # --- PAGE CONFIG ---
 st.set_page_config(
@@ -18,49 +35,188 @@ st.set_page_config(
 # --- SESSION STATE INITIALIZATION ---
 if 'result' not in st.session_state:
     st.session_state['result'] = None
+if 'rows' not in st.session_state:
+    st.session_state['rows'] = None  # RowStore parsed from 'result'
+if 'results_html' not in st.session_state:
+    st.session_state['results_html'] = {}  # (search, page, highlight) -> rendered table page
 if 'confirm_clear' not in st.session_state:
     st.session_state['confirm_clear'] = False
-if 'input_text' not in st.session_state:
-    st.session_state['input_text'] = ""
 if 'file_message' not in st.session_state:
     st.session_state['file_message'] = None
 if 'input_area' not in st.session_state:
     st.session_state['input_area'] = ""
+if 'chunks' not in st.session_state:
+    st.session_state['chunks'] = []  # Chunks from the last TRANSLATE run
+if 'chunk_results' not in st.session_state:
+    st.session_state['chunk_results'] = {'prompt': None, 'results': {}}  # chunk text -> raw output
+if 'job_id' not in st.session_state:
+    st.session_state['job_id'] = None  # Last job, while it still has missing batches
+if 'resume_job' not in st.session_state:
+    st.session_state['resume_job'] = None  # Job to resume on this run
+if 'active_job' not in st.session_state:
+    st.session_state['active_job'] = None  # Job running in the background for this session
+if 'job_errors' not in st.session_state:
+    st.session_state['job_errors'] = {}
+if 'batch_reports' not in st.session_state:
+    st.session_state['batch_reports'] = {}
+
+# --- TRANSLATION CACHE (ONE PER SERVER PROCESS) ---
+@st.cache_resource
+def get_translation_cache():
+    return TranslationCache()
+
+# --- TRANSLATION MEMORY (PAST ROWS, SHARED BY ALL SESSIONS) ---
+@st.cache_resource
+def get_translation_memory():
+    return TranslationMemory()
+
+# --- CONCURRENCY CAP (ONE PER SERVER PROCESS, WHATEVER EACH SESSION'S LIMITS) ---
+MAX_CONCURRENT_REQUESTS = int(os.environ.get("SUBTITLE_MAX_CONCURRENT", "8"))
+
+@st.cache_resource
+def get_request_slots():
+    return threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+# --- REQUEST SCHEDULER (RATE LIMITS SHARED BY ALL SESSIONS WITH THE SAME LIMITS) ---
+@st.cache_resource
+def get_scheduler(requests_per_minute, tokens_per_minute, max_retries):
+    return RequestScheduler(requests_per_minute, tokens_per_minute, max_retries, slots=get_request_slots())
+
+# --- HTTP CLIENT (KEEP-ALIVE CONNECTIONS SHARED BY ALL SESSIONS) ---
+@st.cache_resource
+def get_http_client(connect_timeout, read_timeout):
+    return HttpClient(connect_timeout=connect_timeout, read_timeout=read_timeout)
+
+# --- API KEY POOL (PER-KEY LIMITS AND HEALTH, SHARED BY ALL SESSIONS USING THE SAME KEYS) ---
+@st.cache_resource
+def get_key_pool(api_keys, requests_per_minute, tokens_per_minute):
+    return ApiKeyPool(api_keys, requests_per_minute, tokens_per_minute)
+
+# --- MODEL ROUTER (LATENCY STATS SHARED BY ALL SESSIONS WITH THE SAME SETTINGS) ---
+@st.cache_resource
+def get_router(models, hedge_percentile, max_hedge_share, hedging):
+    return ModelRouter(models, hedge_percentile, max_hedge_share, hedging)
+
+# --- EXPORTS (BUILT WHEN ASKED FOR, CACHED BY THE ROWS' HASH) ---
+@st.cache_data(max_entries=16, show_spinner="Preparing export...")
+def get_export(digest, extension, _rows):
+    return export_rows(_rows, extension)
+
+def prepare_export(digest, extension):
+    st.session_state.setdefault('exports_ready', set()).add((digest, extension))
+
+# --- JOB CHECKPOINTS (SURVIVE REFRESHES AND RESTARTS) ---
+@st.cache_resource
+def get_job_store():
+    return JobStore()
+
+# --- BACKGROUND JOB RUNNER (SHARED BY ALL SESSIONS) ---
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(max_jobs=int(os.environ.get("SUBTITLE_MAX_JOBS", "4")))
+
+# --- STARTUP TIMINGS (FIRST RUN IN THIS SERVER PROCESS) ---
+@st.cache_resource
+def get_startup_timings():
+    return {'imports': IMPORTS_DONE - SCRIPT_STARTED, 'first_run': None}
+
+def mark_job_finished(job_store, status):
+    """Runs on the job thread when a job ends, even if nobody is watching."""
+    if status['state'] == "done":
+        job_store.finish_job(status['job_id'])
+
+# --- RESULTS TABLE ---
+ROWS_PER_PAGE = 100    # Rows sent to the browser at a time, however long the transcript
+MAX_CACHED_PAGES = 40
+
+def render_results_table(data, highlight=None):
+    parts = ["""<table class="results-table">
+<thead>
+<tr>
+<th style="width:50px;">ID</th>
+<th style="text-align:right;">Yiddish Source</th>
+<th>English Subtitle</th>
+</tr>
+</thead>
+<tbody>"""]
+    for row in data:
+        parts.append(f"""<tr{' class="highlight"' if row['id'] == highlight else ''}>
+<td class="id-col">{row['id']}</td>
+<td class="yiddish-col">{row['yiddish']}</td>
+<td class="english-col">{row['english_clean']}</td>
+</tr>""")
+    parts.append("</tbody></table>")
+    return "".join(parts)
 
-# --- HELPER: TEXT CHUNKER ---
-def split_text_smartly(text, chunk_size=5000):
-    """
-    Splits text into chunks of ~chunk_size characters, 
-    but only breaks on newlines to preserve sentence integrity.
-    """
-    lines = text.split('\n')
-    chunks = []
-    current_chunk = []
-    current_length = 0
-    
-    for line in lines:
-        line_len = len(line)
-        # If adding this line exceeds chunk size (and chunk isn't empty), save chunk
-        if current_length + line_len > chunk_size and current_chunk:
-            chunks.append("\n".join(current_chunk))
-            current_chunk = []
-            current_length = 0
-        
-        current_chunk.append(line)
-        current_length += line_len
-    
-    # Append remainder
-    if current_chunk:
-        chunks.append("\n".join(current_chunk))
-        
-    return chunks
+def results_view(rows):
+    """Indexes of the rows matching the current search, in order."""
+    return rows.find(st.session_state.get('results_search', ""))
+
+def on_results_search():
+    st.session_state['results_page'] = 1
+    st.session_state['results_highlight'] = None
+
+def jump_to_row():
+    """Moves the results view to the page holding the requested row ID."""
+    rows = st.session_state['rows']
+    try:
+        target = int(st.session_state['results_jump'].strip()) - 1
+    except ValueError:
+        return
+    if rows is None or not 0 <= target < len(rows):
+        return
+    view = results_view(rows)
+    pos = bisect.bisect_left(view, target)
+    if pos == len(view) or view[pos] != target:
+        st.session_state['results_search'] = "" # The search hides that row
+        pos = target
+    st.session_state['results_page'] = pos // ROWS_PER_PAGE + 1
+    st.session_state['results_highlight'] = rows.row_id(target)
+
+def show_results_page(rows):
+    """Search box, jump-to-ID and one page of the results table (each page is rendered once)."""
+    search_col, jump_col, page_col = st.columns([3, 1, 1])
+    search_col.text_input("Search", key='results_search', on_change=on_results_search,
+                          placeholder="Yiddish or English text")
+    jump_col.text_input("Go to ID", key='results_jump', on_change=jump_to_row)
+
+    view = results_view(rows)
+    pages = max(1, math.ceil(len(view) / ROWS_PER_PAGE))
+    st.session_state['results_page'] = min(max(1, st.session_state.get('results_page', 1)), pages)
+    page = page_col.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key='results_page')
+
+    start = (page - 1) * ROWS_PER_PAGE
+    shown = view[start:start + ROWS_PER_PAGE]
+    if not shown:
+        st.caption("No rows match the search.")
+        return
+    if len(view) < len(rows):
+        st.caption(f"Rows {start + 1}–{start + len(shown)} of {len(view)} matches ({len(rows)} rows in all)")
+    elif pages > 1:
+        st.caption(f"Rows {start + 1}–{start + len(shown)} of {len(rows)}")
+
+    highlight = st.session_state.get('results_highlight')
+    cache = st.session_state['results_html']
+    key = (st.session_state.get('results_search', "").strip().casefold(), page, highlight)
+    if key not in cache:
+        if len(cache) >= MAX_CACHED_PAGES:
+            del cache[next(iter(cache))] # Oldest page
+        cache[key] = render_results_table((rows.record(i) for i in shown), highlight)
+    st.markdown(cache[key], unsafe_allow_html=True)
 
 # --- CALLBACKS ---
+def set_result(raw_text):
+    """Stores a finished translation, parsed once into a RowStore (None clears it)."""
+    st.session_state['result'] = raw_text
+    st.session_state['rows'] = RowStore.from_output(raw_text) if raw_text else None
+    st.session_state['results_html'] = {} # Pages are rendered on first display
+    st.session_state['results_highlight'] = None
+
 def on_text_change():
-    """Clear previous results immediately when text changes."""
-    st.session_state['result'] = None
+    """Clear previous results immediately when text changes (per-chunk results are kept)."""
+    set_result(None)
     st.session_state['confirm_clear'] = False
-    st.session_state['input_text'] = st.session_state.input_area
+    st.session_state['job_id'] = None
 
 def request_clear():
     """Trigger the confirmation dialog."""
@@ -68,17 +224,51 @@ def request_clear():
 
 def confirm_clear_action():
     """Actually clear the data."""
-    st.session_state['result'] = None
-    st.session_state['input_text'] = ""
+    set_result(None)
     st.session_state['input_area'] = ""
     st.session_state['confirm_clear'] = False
     st.session_state['file_message'] = None
+    st.session_state['chunks'] = []
+    st.session_state['chunk_results'] = {'prompt': None, 'results': {}}
+    st.session_state['job_id'] = None
+    if st.session_state.get('active_job'):
+        get_job_runner().cancel(st.session_state['active_job'])
+        st.session_state['active_job'] = None
     st.rerun()
 
 def cancel_clear():
     """Cancel the clear request."""
     st.session_state['confirm_clear'] = False
 
+def resume_job(job_id):
+    """Restore a checkpointed job's text and translate its missing batches on this run."""
+    job = get_job_store().load_job(job_id)
+    if job is None:
+        return
+    st.session_state['input_area'] = job['source_text'] # FORCE WIDGET UPDATE
+    st.session_state['chunks'] = job['chunks']
+    set_result(None)
+    st.session_state['confirm_clear'] = False
+    st.session_state['resume_job'] = job_id
+
+def collect_finished_job(status):
+    """Moves a finished background job's results into this session."""
+    results = status['results']
+    st.session_state['active_job'] = None
+    st.session_state['chunks'] = status['chunks']
+    st.session_state['chunk_results'] = {
+        'prompt': status['system_prompt'],
+        'results': {c: r for c, r in zip(status['chunks'], results) if r is not None}
+    }
+    if status['state'] == "done":
+        # Join all text (in source order) for parsing
+        set_result("\n".join(results))
+        st.session_state['job_id'] = None
+    else:
+        st.session_state['job_id'] = status['job_id'] # Offer to resume
+        st.session_state['job_errors'] = status['errors']
+    st.session_state['batch_reports'] = status['reports']
+
 def handle_file_upload():
     """Robust file reader for .docx and .txt (Blocks .doc)."""
     uploaded_file = st.session_state.uploaded_file
@@ -86,9 +276,11 @@ def handle_file_upload():
     
     if uploaded_file is not None:
         file_name = uploaded_file.name.lower()
+        uploaded_file.seek(0)
+        file_format = detect_format(uploaded_file.read(len(OLE_MAGIC))) # From the magic bytes
         
         # 1. BLOCK OLD .DOC FILES
-        if file_name.endswith('.doc'):
+        if file_name.endswith('.doc') or file_format == "doc":
             st.session_state['input_area'] = ""
             st.session_state['file_message'] = """
             ❌ **Legacy File Detected (.doc)**<br>
@@ -101,313 +293,113 @@ def handle_file_upload():
             """
             return # Stop here
 
-        success = False
-        extracted_text = ""
-        
-        # 2. ATTEMPT .DOCX (Standard)
-        if not success:
-            try:
-                file_bytes = io.BytesIO(uploaded_file.getvalue())
-                doc = Document(file_bytes)
-                full_text = []
-                for para in doc.paragraphs:
-                    full_text.append(para.text)
-                extracted_text = '\n'.join(full_text)
-                success = True
-            except Exception:
-                pass 
-
-        # 3. ATTEMPT PLAIN TEXT (.TXT) - UTF-8
-        if not success:
-            try:
-                extracted_text = uploaded_file.getvalue().decode("utf-8")
-                success = True
-            except:
-                pass
-
-        # 4. ATTEMPT PLAIN TEXT - HEBREW ENCODING (Windows-1255)
-        if not success:
-            try:
-                extracted_text = uploaded_file.getvalue().decode("cp1255")
-                success = True
-            except:
-                pass
+        # 2. .DOCX OR PLAIN TEXT (UTF-8 / Windows-1255), STREAMED FROM THE UPLOAD (NO EXTRA COPY)
+        extracted_text = extract_text(uploaded_file)
 
         # RESULT
-        if success and extracted_text.strip():
-            st.session_state['input_text'] = extracted_text
+        if extracted_text is not None and extracted_text.strip():
             st.session_state['input_area'] = extracted_text # FORCE WIDGET UPDATE
-            st.session_state['result'] = None
+            set_result(None)
         else:
             st.session_state['input_area'] = ""
             st.session_state['file_message'] = "❌ **Unreadable File.** Please upload a valid .docx or .txt file."
 
 # --- CUSTOM CSS ---
-st.markdown("""
-<style>
-    /* IMPORT HEBREW FONTS */
-    @import url('https://fonts.googleapis.com/css2?family=Frank+Ruhl+Libre:wght@400;700&family=Alef:wght@400;700&display=swap');
-
-    /* MAIN BACKGROUND */
-    .stApp {
-        background-color: #FDFBF7;
-        color: #4A3B32;
-    }
-
-    /* SIDEBAR BACKGROUND */
-    section[data-testid="stSidebar"] {
-        background-color: #F3F0E6;
-        border-right: 1px solid #E0DACC;
-    }
-
-    /* HEADERS */
-    h1, h2, h3, h4, .stMarkdown {
-        color: #4A3B32 !important;
-        font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif;
-    }
-    
-    /* PRIMARY BUTTON (TRANSLATE) */
-    div.stButton > button[kind="primary"] {
-        background: linear-gradient(135deg, #A67C52 0%, #8B5A2B 100%);
-        color: white !important;
-        border: none;
-        border-radius: 8px;
-        padding: 0.6rem 1.5rem;
-        font-weight: 600;
-        box-shadow: 0 4px 6px rgba(139, 90, 43, 0.2);
-        transition: all 0.3s ease;
-    }
-    
-    div.stButton > button[kind="primary"]:hover {
-        background: linear-gradient(135deg, #8B5A2B 0%, #6F4E37 100%);
-        box-shadow: 0 6px 8px rgba(139, 90, 43, 0.3);
-        transform: translateY(-1px);
-    }
-    
-    /* SECONDARY BUTTON (CLEAR) */
-    div.stButton > button[kind="secondary"] {
-        background-color: #FFFFFF !important;
-        border: 2px solid #8B5A2B !important;
-        color: #8B5A2B !important;
-        font-weight: bold !important;
-        border-radius: 8px;
-        transition: all 0.3s ease;
-    }
-    
-    div.stButton > button[kind="secondary"]:hover {
-        background-color: #F3F0E6 !important;
-        color: #6F4E37 !important;
-        border-color: #6F4E37 !important;
-    }
-
-    /* INPUT TEXT AREA */
-    .stTextArea textarea {
-        background-color: #FFFFFF;
-        border: 1px solid #D7D0C0;
-        border-radius: 8px;
-        color: #333333;
-        box-shadow: inset 0 2px 4px rgba(0,0,0,0.02);
-    }
-    
-    /* FILE UPLOADER STYLE */
-    [data-testid='stFileUploader'] {
-        margin-bottom: 10px;
-    }
-    [data-testid='stFileUploader'] section {
-        background-color: #FFF;
-        border: 1px dashed #A67C52;
-    }
-
-    /* --- LOADING STEPS STYLING --- */
-    .step-box {
-        background-color: #FFF;
-        border: 1px solid #E0DACC;
-        border-radius: 8px;
-        padding: 20px;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.05);
-        margin-bottom: 20px;
-    }
-    .step-item {
-        font-family: 'Helvetica Neue', sans-serif;
-        font-size: 1.05em;
-        padding: 8px 0;
-        color: #888;
-        display: flex;
-        align-items: center;
-        transition: color 0.3s ease;
-    }
-    .step-item.active {
-        color: #8B5A2B;
-        font-weight: bold;
-    }
-    .step-item.done {
-        color: #2E7D32; /* Green */
-        font-weight: bold;
-    }
-    .step-icon {
-        margin-right: 12px;
-        width: 20px;
-        display: inline-block;
-        text-align: center;
-    }
-
-    /* --- TABLE STYLING --- */
-    .results-table {
-        width: 100%;
-        border-collapse: collapse;
-        margin-top: 20px;
-        background-color: #FFF;
-        border-radius: 8px;
-        overflow: hidden;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.05);
-        border: 1px solid #E0DACC;
-    }
-    .results-table th {
-        background-color: #EBE5D5;
-        color: #4A3B32;
-        padding: 12px 15px;
-        text-align: left;
-        font-weight: bold;
-        border-bottom: 2px solid #D7D0C0;
-        font-size: 0.95em;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-    }
-    .results-table td {
-        padding: 12px 15px;
-        border-bottom: 1px solid #F0EAE0;
-        vertical-align: top; 
-        color: #333;
-    }
-    .results-table tr:last-child td {
-        border-bottom: none;
-    }
-    .results-table tr:hover {
-        background-color: #FAF8F2;
-    }
-    .id-col { width: 50px; color: #8B5A2B; font-weight: bold; font-size: 0.85em; text-align: center; }
-    .yiddish-col { font-family: 'Frank Ruhl Libre', 'Alef', serif; font-size: 1.3em; direction: rtl; text-align: right; color: #222; width: 45%; line-height: 1.5; }
-    .english-col { font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; font-size: 1.05em; line-height: 1.5; width: 45%; color: #111; }
-</style>
-""", unsafe_allow_html=True)
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # --- SIDEBAR (SETTINGS) ---
 with st.sidebar:
     st.markdown("### Settings")
-    api_key = st.text_input("Enter Google API Key", type="password")
-    
-    default_prompt = """
-# Role
-You are a master subtitler adapting the Lubavitcher Rebbe’s Sichos. Your goal is to produce **narrative, high-impact English** that captures the speaker's voice while adhering to strict video-subtitle standards.
-
-# MODULE A: PERSPECTIVE (The "No Narrator" Rule)
-* **CRITICAL:** These are subtitles for the person on screen.
-* **FORBIDDEN:** Never write "The Rebbe explains," "He emphasizes," "The speaker continues," or "They teach us."
-* **ACTION:** Translate ONLY what is said in the first person (I/We).
-    * *Bad:* "The Rebbe explains that the Alter Rebbe was released..."
-    * *Good:* "Although **the Alter Rebbe** was released..."
-
-# MODULE B: FIDELITY & AGGRESSIVE SEGMENTATION
-* **The "Zero-Loss" Rule:** Do not summarize. Every distinct thought in the Yiddish must have a corresponding English phrase.
-* **The "Short-Burst" Rule:** Do not try to fit a long Yiddish sentence into one subtitle. **Break long complex sentences into 2, 3, or even 4 separate, short subtitle events.**
-    * *Logic:* Better to have 3 short, readable subtitles than 1 long, crowded one.
-
-# MODULE C: NARRATIVE VOICE & THEOLOGY
-### 1. VOICE ATTRIBUTION (Internal Dialogue)
-* **Action:** Insert tags to describe internal thought processes of *characters in the story* (not the speaker).
-    * *Input:* "If the other person..." -> *Output:* "**Moses reasoned**, 'If another person...'"
-
-### 2. PHENOMENON OVER LABEL
-* **Action:** Describe the effect/meaning, not the technical label.
-    * *Input:* "Nimna Hanimnaos" -> *Output:* "**God, who is Infinite, and therefore contains the finite.**"
-
-### 3. THE "QUOTE CONTEXT" RULE
-* **Liturgy:** Translate objects of study literally ("**Hear O Israel...**").
-* **Prooftext:** Translate the point of the quote ("**Man was born to toil**").
-
-# MODULE D: CULTURAL & LINGUISTIC TRANSLATION
-### 4. CONCEPT OVER ETYMOLOGY
-* **Action:** Translate the *implication*, not the literal word.
-    * *Input:* "Chozer L'buryo" -> "**Returns to full health**" (NOT "Returns to his wholeness").
-    * *Input:* "Adam" -> "**Created in God's image.**"
-
-### 5. MECHANICS VS. MEANING
-* **Action:** If text uses mechanics (Gematria/Letters) to explain a concept, translate the **concept**.
-
-### 6. RELATIONAL TITLES
-* **Action:** *Der Rebbe (Nishmaso Eden)* -> "**My father-in-law, the Rebbe.**"
-
-# MODULE E: VISUAL STRUCTURE & RHYTHM
-* **Length:** Max 42 characters per line.
-* **Balance:** If using 2 lines, keep them roughly equal in length.
-* **Split:** Use the tilde symbol `~` to indicate a visual line break inside a single subtitle row.
-
-# MODULE F: SYNTAX (The "Manual" Rules)
-* **Active Voice:** "It is believed by many" -> "**Many believe**"
-* **No Double Negatives:** "Not only will they not disturb" -> "**The government will not disturb; / on the contrary, it will help.**"
-
-# FEW-SHOT EXAMPLES (Correct Style)
-
-### Example 1: Removing "The Rebbe Explains" & Segmentation
-*Input:*
-וואָרום אף על פי וואָס דער שחרור פון דעם אַלטן רבי'ן איז געווען ביום י"ט כסלו, איז דאָך געווען כמה סיבות וואָס דערפאַר האָט זיך פאַרהאַלטן
-*Output:*
-001 | וואָרום אף על פי וואָס דער שחרור... | And yes, **the Alter Rebbe**~was technically released on the 19th.
-002 | איז דאָך געווען כמה סיבות וואָס דערפאַר האָט זיך פאַרהאַלטן | However, due to various reasons,~he was detained.
-
-### Example 2: Idiomatic Translation (No "Wholeness")
-*Input:*
-נאָר אויך ער דאַרף צוואוואַרטן ביז "חוזר לבוריו" – ער ווערט אינגאַנצן געזונט
-*Output:*
-010 | נאָר אויך ער דאַרף צוואוואַרטן ביז "חוזר לבוריו" | One waits until he~"returns to full health."
-011 | ער ווערט אינגאַנצן געזונט | Only then is the recovery complete.
-
-### Example 3: Voice Attribution (Internal Character)
-*Input:*
-משה האט געטראכט אז אויב יענער טוט אזוי...
-*Output:*
-020 | משה האט געטראכט אז אויב יענער טוט אזוי... | **Moses reasoned:**~"If that person acts this way..."
-
-# TECHNICAL OUTPUT FORMAT
-Provide the output as a simple list with 3 columns separated by pipes (|).
-Do NOT use Markdown Table syntax. Just raw lines.
-
-Format:
-ID | Yiddish Snippet | English Subtitle
-    """
+    api_key = st.text_input("Enter Google API Key", type="password",
+                            help="Separate several keys with commas to spread a job over all their quotas.")
+    api_keys = tuple(dict.fromkeys(k.strip() for k in api_key.split(",") if k.strip()))
+    key_count = max(1, len(api_keys))
     
     with st.expander("Edit System Prompt"):
-        system_prompt = st.text_area("Prompt", value=default_prompt, height=400)
-
-# --- API FUNCTION (SYNC) ---
-def call_api(model_name, api_key, full_prompt):
-    url = f"https://generativelanguage.googleapis.com/v1beta/{model_name}:generateContent?key={api_key}"
-    headers = {'Content-Type': 'application/json'}
-    data = {
-        "contents": [{"parts": [{"text": full_prompt}]}],
-        "safetySettings": [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
-        ]
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(data))
-        if response.status_code == 200:
-            result_json = response.json()
-            try:
-                text = result_json['candidates'][0]['content']['parts'][0]['text']
-                return True, text
-            except KeyError:
-                return False, f"Parsed JSON but found no text: {result_json}"
-        elif response.status_code == 404:
-            return False, "NOT_FOUND"
-        else:
-            return False, f"Error {response.status_code}: {response.text}"
-    except Exception as e:
-        return False, str(e)
+        system_prompt = st.text_area("Prompt", value=DEFAULT_PROMPT, height=400)
+
+    stream_results = st.checkbox("Show subtitles as they arrive", value=True,
+                                 help="Streams each batch and adds rows to the table live.")
+    json_output = st.checkbox("Structured JSON output", value=False,
+                              help="Asks the model for rows as JSON instead of a '|' table, so snippets with "
+                                   "pipes or dashes and wrapped lines aren't lost. Rows then appear per batch.")
+    cache_prompt = st.checkbox("Cache system prompt", value=True,
+                               help="Sends the prompt to the API once per job and model instead of with every "
+                                    "batch, so batches start faster and cost less. Falls back to sending it "
+                                    "each time if the API won't cache it.")
+    fill_gaps = st.checkbox("Re-request dropped lines", value=True,
+                            help="Checks every batch against its source and translates any lines the model "
+                                 "skipped on their own (a few small extra requests).")
+    fix_subtitles = st.checkbox("Enforce subtitle rules", value=True,
+                                help="Re-breaks rows with lines over 42 characters, uneven lines or no English. "
+                                     "Rows that can't be fixed locally go back to the model in one small request.")
+
+    token_budget = st.number_input("Batch Size (tokens)", min_value=1000, max_value=60000,
+                                   value=DEFAULT_TOKEN_BUDGET, step=1000,
+                                   help="Input plus expected output per batch. Larger batches mean fewer requests.")
+
+    max_workers = st.slider("Parallel Batches", min_value=1, max_value=8, value=4,
+                            help="How many batches are sent to the API at the same time.")
+
+    with st.expander("Rate Limits"):
+        rpm_limit = st.number_input("Requests per minute (per key)", min_value=1, value=60, step=10)
+        tpm_limit = st.number_input("Tokens per minute (per key)", min_value=1000, value=1_000_000, step=100_000)
+        max_retries = st.number_input("Retries per batch", min_value=0, max_value=20, value=5,
+                                      help="Transient errors (429 / 5xx / timeouts) are retried with backoff.")
+        connect_timeout = st.number_input("Connect timeout (s)", min_value=1, max_value=120, value=10)
+        read_timeout = st.number_input("Read timeout (s)", min_value=10, max_value=1800, value=300,
+                                       help="Longest the API may go silent mid-response before the request is retried.")
+        st.caption(f"At most {MAX_CONCURRENT_REQUESTS} requests are in flight at once across all users "
+                   "(set SUBTITLE_MAX_CONCURRENT to change).")
+        scheduler_stats_box = st.empty()
+    # All keys together: the per-key limits are enforced by the key pool
+    scheduler = get_scheduler(int(rpm_limit) * key_count, int(tpm_limit) * key_count, int(max_retries))
+
+    if len(api_keys) > 1:
+        with st.expander(f"API Keys ({len(api_keys)})"):
+            key_stats_box = st.empty()
+
+    with st.expander("Model Routing"):
+        model_list = st.text_area("Models (in order of preference)", value="\n".join(MODELS),
+                                  help="One per line. The next model is the fallback and the hedge target.")
+        models = tuple(m.strip() for m in model_list.splitlines() if m.strip()) or tuple(MODELS)
+        hedging = st.checkbox("Hedge slow requests", value=True,
+                              help="If a batch takes longer than the model usually does, the same request "
+                                   "also goes to the next model and the first answer is used.")
+        hedge_percentile = st.slider("Hedge after percentile", min_value=50, max_value=99, value=95,
+                                     disabled=not hedging)
+        max_hedge_share = st.slider("Max extra requests (%)", min_value=0, max_value=50, value=10,
+                                    disabled=not hedging,
+                                    help="Cost cap: hedges never exceed this share of all requests.")
+        router = get_router(models, hedge_percentile, max_hedge_share / 100, hedging)
+        router_stats_box = st.empty()
+
+    with st.expander("Translation Cache"):
+        bypass_cache = st.checkbox("Bypass cache", value=False,
+                                   help="Always call the API. Fresh results still overwrite the cache.")
+        cache_stats_box = st.empty()
+        if st.button("Clear Cache", use_container_width=True):
+            get_translation_cache().clear()
+
+    with st.expander("Translation Memory"):
+        use_memory = st.checkbox("Use translation memory", value=True,
+                                 help="Lines translated in earlier jobs are reused without an API call, and "
+                                      "similar passages are shown to the model so terminology stays consistent.")
+        memory_stats_box = st.empty()
+        if st.button("Clear Memory", use_container_width=True):
+            get_translation_memory().clear()
+
+    with st.expander("Startup"):
+        timing_box = st.empty()
+
+    unfinished = get_job_store().unfinished_jobs()
+    if unfinished:
+        with st.expander(f"Unfinished Jobs ({len(unfinished)})"):
+            for job_id, title, saved, total, updated in unfinished:
+                st.markdown(f"**{title}…**<br>{saved} of {total} batches saved · "
+                            f"{time.strftime('%d %b %H:%M', time.localtime(updated))}", unsafe_allow_html=True)
+                st.button("Resume", key=f"resume_{job_id}", on_click=resume_job, args=(job_id,),
+                          use_container_width=True)
 
 # --- RENDERER FOR LOADING ANIMATION ---
 def render_steps(steps, current_idx):
@@ -494,117 +486,268 @@ with col2:
     # Logic Container
     result_container = st.container()
 
-    if translate_btn and not st.session_state.get('confirm_clear'):
-        if not api_key:
+    job_store = get_job_store()
+    resume_job_id = st.session_state['resume_job']
+    st.session_state['resume_job'] = None
+    chunks = None
+
+    if (translate_btn or resume_job_id) and not st.session_state.get('confirm_clear'):
+        if not api_keys:
             st.error("Please enter your API Key in the sidebar.")
+        elif resume_job_id:
+            # 1. RESUME: only the batches without a checkpoint are sent
+            job = job_store.load_job(resume_job_id)
+            if job is None:
+                st.error("This job is no longer available. Please translate again.")
+            else:
+                job_id = resume_job_id
+                job_prompt = job['system_prompt']
+                chunks = job['chunks']
+                known_results = {i: r for i, r in enumerate(job['results']) if r is not None}
         elif not yiddish_text:
             st.warning("Please paste text to translate.")
         else:
-            # 1. SPLIT INTO BATCHES
-            chunks = split_text_smartly(yiddish_text)
-            total_chunks = len(chunks)
-            
-            full_results_acc = []
-            
-            # 2. UI ELEMENTS FOR PROGRESS
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            # 3. LOOP THROUGH BATCHES
-            for i, chunk in enumerate(chunks):
-                batch_num = i + 1
-                status_text.markdown(f"**Processing Batch {batch_num} of {total_chunks}...**")
-                
-                # --- Small Loading Animation for Batch 1 only (Visual Flair) ---
-                if batch_num == 1:
-                    loading_placeholder = st.empty()
-                    steps = ["Analyzing Context...", "Translating...", "Refining Syntax..."]
-                    for s_idx, s_txt in enumerate(steps):
-                        loading_placeholder.markdown(render_steps(steps, s_idx), unsafe_allow_html=True)
-                        time.sleep(0.5)
-                    loading_placeholder.empty()
-
-                # Call API
-                combined_prompt = f"{system_prompt}\n\n---\n\nTASK: Translate this text part ({batch_num}/{total_chunks}):\n{chunk}"
-                success, result = call_api("models/gemini-2.5-flash", api_key, combined_prompt)
-                
-                # Retry Logic (Backup Model)
-                if not success and result == "NOT_FOUND":
-                    success, result = call_api("models/gemini-1.5-flash", api_key, combined_prompt)
-
-                if success:
-                    full_results_acc.append(result)
-                    progress_bar.progress(batch_num / total_chunks)
-                else:
-                    st.error(f"❌ Failed on Batch {batch_num}: {result}")
-                    break
-            
-            status_text.empty()
-            
-            if len(full_results_acc) == total_chunks:
-                # Join all text for parsing
-                st.session_state['result'] = "\n".join(full_results_acc)
+            # 1. SPLIT INTO BATCHES (keeping unchanged chunks from the last run)
+            chunks = split_text_incrementally(yiddish_text, st.session_state['chunks'], int(token_budget))
+            job_prompt = system_prompt
+
+            # Reuse results of chunks that haven't changed since the last run
+            store = st.session_state['chunk_results']
+            if store['prompt'] != system_prompt or bypass_cache:
+                store = {'prompt': system_prompt, 'results': {}}
+            known_results = {i: store['results'][c] for i, c in enumerate(chunks) if c in store['results']}
+
+            # ...and any batches already checkpointed for this exact job
+            job_id = job_store.start_job(yiddish_text, system_prompt, chunks)
+            for i, result in enumerate(job_store.load_job(job_id)['results']):
+                if result is None and i in known_results:
+                    job_store.save_batch(job_id, i, known_results[i])
+                elif result is not None and not bypass_cache:
+                    known_results.setdefault(i, result)
+
+    if chunks is not None:
+        # 2. HAND THE JOB TO THE BACKGROUND RUNNER (it survives reruns and closed tabs)
+        get_job_runner().submit(
+            job_id, chunks, job_prompt, api_keys[0],
+            known_results=known_results,
+            on_finished=functools.partial(mark_job_finished, job_store),
+            max_workers=max_workers,
+            cache=get_translation_cache(),
+            read_cache=not bypass_cache,
+            scheduler=scheduler,
+            stream=stream_results,
+            json_output=json_output,
+            cache_prompt=cache_prompt,
+            fill_gaps=fill_gaps,
+            fix_subtitles=fix_subtitles,
+            memory=get_translation_memory() if use_memory else None,
+            key_pool=get_key_pool(api_keys, int(rpm_limit), int(tpm_limit)),
+            router=router,
+            checkpoint=functools.partial(job_store.save_batch, job_id),
+            client=get_http_client(float(connect_timeout), float(read_timeout))
+        )
+        st.session_state['active_job'] = job_id
+        st.session_state['job_id'] = None
+        st.session_state['job_errors'] = {}
+        st.session_state['batch_reports'] = {}
+
+    # --- ACTIVE JOB (POLLED ONCE A SECOND WHILE IT RUNS) ---
+    @st.fragment(run_every=1.0)
+    def show_active_job():
+        job_id = st.session_state.get('active_job')
+        if not job_id:
+            return
+        status = get_job_runner().status(job_id)
+        if status is None:
+            # Server restarted: what was finished is in the checkpoints
+            st.session_state['active_job'] = None
+            st.session_state['job_id'] = job_id
+            st.rerun()
+        elif status['state'] not in ACTIVE_STATES:
+            collect_finished_job(status)
+            st.rerun()
+
+        # Progress
+        steps = ["Analyzing Context...", "Translating...", "Refining Syntax..."]
+        step_idx = 0 if status['state'] == "queued" else (1 if status['completed'] < status['total'] else 2)
+        st.markdown(render_steps(steps, step_idx), unsafe_allow_html=True)
+        st.progress(status['completed'] / max(status['total'], 1))
+        sched = scheduler.stats()
+        st.markdown(
+            f"**{status['completed']} of {status['total']} Batches done...** "
+            f"Queued: {sched['queue_depth']} · Throttled: {sched['throttle_time']:.1f}s"
+        )
+        for i, error in sorted(status['errors'].items()):
+            st.error(f"❌ Failed on Batch {i + 1}: {error}")
+        st.button("Cancel", type="secondary", use_container_width=True,
+                  on_click=get_job_runner().cancel, args=(job_id,))
+
+        # Rows streamed in so far (the latest page of them)
+        if status['rows']:
+            streamed = build_rows(status['rows'])
+            if len(streamed) > ROWS_PER_PAGE:
+                st.caption(f"Latest {ROWS_PER_PAGE} of {len(streamed)} rows")
+            st.markdown(render_results_table(streamed[-ROWS_PER_PAGE:]), unsafe_allow_html=True)
+
+    # Only mounted while a job runs, so idle tabs don't poll once a second
+    if st.session_state.get('active_job') and not st.session_state.get('confirm_clear'):
+        show_active_job()
+
+    # --- INCOMPLETE JOB (RESUME) ---
+    if st.session_state.get('job_id') and not st.session_state.get('result') \
+            and not st.session_state.get('confirm_clear'):
+        job = job_store.load_job(st.session_state['job_id'])
+        if job and job['missing']:
+            missing = ", ".join(str(i + 1) for i in job['missing'])
+            st.warning(f"⚠️ **Translation incomplete.** {len(job['missing'])} of {len(job['chunks'])} "
+                       f"batches are missing (batch {missing}). Finished batches are saved.")
+            for i, error in sorted(st.session_state.get('job_errors', {}).items()):
+                st.error(f"❌ Failed on Batch {i + 1}: {error}")
+            st.button("Resume", type="primary", use_container_width=True,
+                      on_click=resume_job, args=(job['job_id'],))
 
     # --- RESULTS DISPLAY ---
     if st.session_state.get('result') and not st.session_state.get('confirm_clear'):
         raw_text = st.session_state['result']
-        
-        # Parse Data
-        data = []
-        global_id_counter = 1 # Force Sequential IDs across all batches
-        
-        for line in raw_text.split('\n'):
-            if "|" in line and "ID |" not in line and "---" not in line:
-                parts = line.split('|')
-                if len(parts) >= 3:
-                    # Clean ID: 001, 002...
-                    clean_id = f"{global_id_counter:03d}"
-                    global_id_counter += 1
-                    
-                    data.append({
-                        "id": clean_id,
-                        "yiddish": parts[1].strip(),
-                        "english_clean": parts[2].strip().replace("~", " "),
-                        "english_raw": parts[2].strip().replace("~", "\n")
-                    })
-        
+        rows = st.session_state['rows'] # Parsed once, when the job finished
+
         with result_container:
-            if data:
-                # Build HTML Table
-                table_html = """<table class="results-table">
-<thead>
-<tr>
-<th style="width:50px;">ID</th>
-<th style="text-align:right;">Yiddish Source</th>
-<th>English Subtitle</th>
-</tr>
-</thead>
-<tbody>"""
-                for row in data:
-                    table_html += f"""<tr>
-<td class="id-col">{row['id']}</td>
-<td class="yiddish-col">{row['yiddish']}</td>
-<td class="english-col">{row['english_clean']}</td>
-</tr>"""
-                table_html += "</tbody></table>"
-                
-                st.markdown(table_html, unsafe_allow_html=True)
+            if rows:
+                show_results_page(rows)
                 
-                # DOCX Export
-                df = pd.DataFrame(data)
-                doc = Document()
-                table = doc.add_table(rows=1, cols=3)
-                table.style = 'Table Grid'
-                for idx, row in df.iterrows():
-                    cells = table.add_row().cells
-                    cells[0].text = row['id']
-                    cells[1].text = row['yiddish']
-                    cells[2].text = row['english_raw']
-                
-                bio = io.BytesIO()
-                doc.save(bio)
+                # Exports: nothing is built until asked for, then it's cached
                 st.markdown("<br>", unsafe_allow_html=True)
-                st.download_button("Download DOCX", bio.getvalue(), "translation.docx", use_container_width=True)
+                format_col, button_col = st.columns([1, 2])
+                label = format_col.selectbox("Export format", list(EXPORT_FORMATS), key='export_format',
+                                             label_visibility="collapsed")
+                extension, mime = EXPORT_FORMATS[label]
+                if (rows.digest(), extension) in st.session_state.get('exports_ready', set()):
+                    button_col.download_button(f"Download {label}", get_export(rows.digest(), extension, rows),
+                                               f"translation.{extension}", mime=mime, use_container_width=True)
+                else:
+                    button_col.button(f"Prepare {label}", use_container_width=True,
+                                      on_click=prepare_export, args=(rows.digest(), extension))
+                if extension in ("srt", "vtt"):
+                    st.caption("Cue timings are provisional (from reading speed); sync them in your editor.")
+
+            reports = sorted(st.session_state.get('batch_reports', {}).items())
+
+            # Source coverage (lines the model skipped)
+            gaps = [(i, gap) for i, report in reports for gap in report.get('gaps', [])]
+            if gaps:
+                unfilled = [(i, gap) for i, gap in gaps if not gap['filled']]
+                label = f"Coverage: {len(gaps) - len(unfilled)} of {len(gaps)} dropped passages re-translated"
+                with st.expander(("⚠️ " if unfilled else "✅ ") + label, expanded=bool(unfilled)):
+                    for i, gap in gaps:
+                        mark = "✅" if gap['filled'] else "❌ still missing:"
+                        st.markdown(f"{mark} Batch {i + 1}, chars {gap['start']}–{gap['end']}: {gap['text'][:200]}")
+
+            # Subtitle rules (line length, balance, empty English)
+            fixes = [(i, report['subtitles']) for i, report in reports if report.get('subtitles')]
+            if fixes:
+                flagged = sum(s['flagged'] for _, s in fixes)
+                failing = [(i, row) for i, s in fixes for row in s['still_failing']]
+                label = (f"Subtitle rules: {flagged} rows fixed "
+                         f"({sum(s['fixed_locally'] for _, s in fixes)} locally, "
+                         f"{sum(s['fixed_by_model'] for _, s in fixes)} by the model)")
+                if failing:
+                    label = f"Subtitle rules: {len(failing)} of {flagged} flagged rows still need attention"
+                with st.expander(("⚠️ " if failing else "✅ ") + label, expanded=bool(failing)):
+                    for i, (_, yiddish, english, problems) in failing:
+                        reasons = ", ".join(PROBLEM_LABELS[p] for p in problems)
+                        st.markdown(f"❌ Batch {i + 1} · {reasons}: {yiddish[:80]} → {english.replace('~', ' / ')}")
+                    if not failing:
+                        st.caption("Every row now meets the 42-character, two-line limits.")
+
+            # Performance (where the time and tokens went)
+            records = [report['metrics'] for _, report in reports if report.get('metrics')]
+            if records:
+                summary = summarize(records)
+
+                def secs(value):
+                    return f"{value:.1f}s" if value is not None else "–"
+
+                label = (f"Performance: {summary['requests']} requests, "
+                         f"{summary['prompt_tokens']:,} prompt / {summary['output_tokens']:,} output tokens")
+                with st.expander("📊 " + label):
+                    st.markdown(
+                        "| | p50 | p95 | max | total |\n|---|---|---|---|---|\n" + "\n".join(
+                            f"| {name} | {secs(summary[key]['p50'])} | {secs(summary[key]['p95'])} | "
+                            f"{secs(summary[key]['max'])} | {secs(summary[key]['total'])} |"
+                            for name, key in (("Queue wait", "queue_wait"), ("Request latency", "latency"),
+                                              ("Batch time", "seconds"))
+                        )
+                    )
+                    reasons = ", ".join(f"{k} ×{v}" for k, v in summary['finish_reasons'].items()) or "–"
+                    model_counts = ", ".join(f"{k.split('/')[-1]} ×{v}" for k, v in summary['models'].items()) or "–"
+                    st.markdown(
+                        f"**Batches:** {summary['batches']} ({summary['cached']} from cache) &nbsp; "
+                        f"**Retries:** {summary['retries']} &nbsp; "
+                        f"**Thinking tokens:** {summary['thought_tokens']:,} &nbsp; "
+                        f"**Prompt tokens from cache:** {summary['cached_tokens']:,}<br>"
+                        f"**Finish reasons:** {reasons}<br>**Models:** {model_counts}",
+                        unsafe_allow_html=True
+                    )
+                    st.dataframe(records, use_container_width=True, hide_index=True)
+                    st.download_button("Download metrics (JSON lines)", to_jsonl(records),
+                                       "batch_metrics.jsonl", mime="application/jsonl")
             
             with st.expander("View Raw Output"):
                 st.text(raw_text)
+
+# --- SCHEDULER / CACHE STATS (rendered last so they include this run) ---
+sched_stats = scheduler.stats()
+job_stats = get_job_runner().stats()
+scheduler_stats_box.markdown(
+    f"**Queue:** {sched_stats['queue_depth']} &nbsp; **In flight:** {sched_stats['in_flight']}<br>"
+    f"**Retries:** {sched_stats['retries']} &nbsp; **Throttled:** {sched_stats['throttle_time']:.1f}s<br>"
+    f"**Jobs running:** {job_stats['running']} &nbsp; **Queued:** {job_stats['queued']}",
+    unsafe_allow_html=True
+)
+
+cache_stats = get_translation_cache().stats()
+cache_stats_box.markdown(
+    f"**Hits:** {cache_stats['hits']} &nbsp; **Misses:** {cache_stats['misses']}<br>"
+    f"**Entries:** {cache_stats['entries']} ({cache_stats['bytes'] / 1024:.0f} KB)",
+    unsafe_allow_html=True
+)
+
+if use_memory: # Otherwise the memory isn't opened at all
+    memory_stats = get_translation_memory().stats()
+    memory_stats_box.markdown(
+        f"**Entries:** {memory_stats['entries']}<br>"
+        f"**Lines reused:** {memory_stats['reused_lines']} &nbsp; **Hints:** {memory_stats['hints']}",
+        unsafe_allow_html=True
+    )
+
+router_stats = router.stats()
+router_stats_box.markdown(
+    "".join(
+        f"**{model.split('/')[-1]}:** p50 {s['p50']:.1f}s · p95 {s['p95']:.1f}s per 1k tokens<br>"
+        if s['p95'] is not None else f"**{model.split('/')[-1]}:** {s['samples']} samples so far<br>"
+        for model, s in router_stats['models'].items()
+    )
+    + f"**Hedged:** {router_stats['hedges']} of {router_stats['requests']} &nbsp; **Won:** {router_stats['hedge_wins']}",
+    unsafe_allow_html=True
+)
+
+if len(api_keys) > 1:
+    key_stats_box.markdown(
+        "<br>".join(
+            f"**{k['key']}** {'✅' if k['health'] == 'ok' else '⏳' if k['health'].startswith('cooling') else '❌'} "
+            f"{k['health']} · {k['requests']} req · {k['rate_limited']}× 429 · {k['errors']} errors"
+            for k in get_key_pool(api_keys, int(rpm_limit), int(tpm_limit)).stats()
+        ),
+        unsafe_allow_html=True
+    )
+
+# Filled last, so "this run" covers the whole script
+startup = get_startup_timings()
+run_seconds = time.perf_counter() - SCRIPT_STARTED
+if startup['first_run'] is None:
+    startup['first_run'] = run_seconds
+timing_box.markdown(
+    f"**Imports (cold start):** {startup['imports'] * 1000:.0f} ms<br>"
+    f"**First run:** {startup['first_run'] * 1000:.0f} ms &nbsp; **This run:** {run_seconds * 1000:.0f} ms",
+    unsafe_allow_html=True
+)
@@ -0,0 +1,172 @@
+"""
+Offline benchmark: runs the whole pipeline against a local Gemini stand-in.
+
+For each transcript size, a synthetic Yiddish transcript is generated and
+pushed through ingestion and chunking, run_batches (call_api, the scheduler,
+coverage and subtitle checks), parsing into a RowStore and the text exports.
+Results are printed as JSON: per size, the time spent in each stage,
+throughput, batch latency percentiles, retries, the faults the stand-in
+injected and peak memory.
+
+    python benchmark.py
+    python benchmark.py --sizes 10000,100000,500000 --latency lognormal:0.8,0.4 --rate-429 0.05 -o bench.json
+    python benchmark.py --prefill-per-1k 0.05 --cache-prompt
+"""
+import argparse
+import io
+import json
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+from chunker import DEFAULT_TOKEN_BUDGET, split_text_smartly
+from exporters import TEXT_EXPORTS, export_rows
+from ingest import iter_lines
+from metrics import summarize
+from pipeline import HttpClient, run_batches
+from prompts import DEFAULT_PROMPT
+from row_store import RowStore
+from scheduler import RequestScheduler
+from stand_in_server import StandInServer
+
+WORDS = (
+    "דער רבי האט געזאגט אז מען דארף לערנען תורה מיט שמחה און יעדער איד איז א חלק פון "
+    "דעם אויבערשטן דאס הייסט ביז משיח צדקנו וועט קומען באלד אין אונזערע טעג חסידות "
+    "פארשטיין ווי אזוי ס'איז מבואר אין תניא פרק ל״ב אהבת ישראל ווארום דער אלטער רבי "
+    "שרייבט אַז דער עיקר איז די כוונה פון מצוות בפועל ממש"
+).split()
+
+
+def synthetic_transcript(chars, seed=0):
+    """About chars characters of Yiddish-looking text: sentences of 6-20 words, 1-4 per line."""
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < chars:
+        sentences = []
+        for _ in range(rng.randint(1, 4)):
+            words = rng.choices(WORDS, k=rng.randint(6, 20))
+            sentences.append(" ".join(words) + rng.choice([".", ".", ",", "?", ":"]))
+        line = " ".join(sentences)
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)[:chars]
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024) # Bytes on macOS, KB elsewhere
+
+
+def run_size(chars, args, server):
+    """One end-to-end run on a transcript of chars characters. Returns its result dict."""
+    source = synthetic_transcript(chars, args.seed).encode("utf-8")
+    counts_before = dict(server.counts)
+    scheduler = RequestScheduler(args.rpm, args.tpm, args.retries, max_concurrent=args.max_concurrent)
+    client = HttpClient(server.url, connect_timeout=5, read_timeout=60, pool_size=args.max_concurrent)
+    reports = {}
+
+    tracemalloc.start()
+    stages = {}
+    started = time.perf_counter()
+
+    chunks = split_text_smartly(iter_lines(io.BytesIO(source)), args.token_budget)
+    stages["chunk"] = time.perf_counter() - started
+
+    mark = time.perf_counter()
+    results, errors = run_batches(
+        chunks, DEFAULT_PROMPT, "stand-in-key",
+        max_workers=args.batch_workers,
+        scheduler=scheduler,
+        stream=args.stream,
+        client=client,
+        json_output=args.json_output,
+        cache_prompt=args.cache_prompt,
+        on_report=lambda i, report: reports.__setitem__(i, report),
+    )
+    stages["translate"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    rows = RowStore.from_output("\n".join(r for r in results if r is not None))
+    stages["parse"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    export_bytes = {extension: len(export_rows(rows, extension)) for extension in args.exports}
+    stages["export"] = time.perf_counter() - mark
+
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    summary = summarize(report["metrics"] for report in reports.values() if report.get("metrics"))
+    return {
+        "chars": len(source.decode("utf-8")),
+        "chunks": len(chunks),
+        "rows": len(rows),
+        "failed_batches": len(errors),
+        "seconds": {name: round(value, 4) for name, value in dict(stages, total=total).items()},
+        "throughput": {
+            "chars_per_second": round(chars / total, 1),
+            "rows_per_second": round(len(rows) / total, 1),
+            "batches_per_second": round(len(chunks) / total, 2),
+        },
+        "batch_latency": summary["latency"],
+        "batch_seconds": summary["seconds"],
+        "queue_wait": summary["queue_wait"],
+        "requests": summary["requests"],
+        "retries": summary["retries"],
+        "tokens": {"prompt": summary["prompt_tokens"], "cached": summary["cached_tokens"],
+                   "output": summary["output_tokens"]},
+        "server": {name: server.counts[name] - counts_before[name] for name in server.counts},
+        "export_bytes": export_bytes,
+        "peak_traced_mb": round(peak / 1e6, 2),
+        "max_rss_mb": round(max_rss_mb(), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local Gemini stand-in.")
+    parser.add_argument("--sizes", default="10000,100000,500000", help="Comma-separated transcript sizes (characters)")
+    parser.add_argument("--latency", default="lognormal:0.3,0.4",
+                        help="Stand-in latency: fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA or exponential:MEAN")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Seconds the stand-in asks for on a 429")
+    parser.add_argument("--stream", action="store_true", help="Use streamGenerateContent")
+    parser.add_argument("--json-output", action="store_true", help="Request structured JSON rows")
+    parser.add_argument("--cache-prompt", action="store_true", help="Send the system prompt as cached content")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.0,
+                        help="Stand-in delay per 1k prompt tokens not served from cached content")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    parser.add_argument("--batch-workers", type=int, default=8)
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=100_000)
+    parser.add_argument("--tpm", type=int, default=100_000_000)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--exports", default="srt,vtt,csv", help=f"Comma-separated, from: docx,{','.join(TEXT_EXPORTS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+    args.exports = [e for e in args.exports.split(",") if e]
+
+    with StandInServer(latency=args.latency, rate_429=args.rate_429, rate_503=args.rate_503,
+                       retry_after=args.retry_after, seed=args.seed, prefill_per_1k=args.prefill_per_1k) as server:
+        runs = []
+        for size in (int(s) for s in args.sizes.split(",") if s):
+            print(f"{size:,} characters...", file=sys.stderr)
+            runs.append(run_size(size, args, server))
+
+    config = {name: value for name, value in vars(args).items() if name != "output"}
+    output = json.dumps({"config": config, "python": sys.version.split()[0], "runs": runs}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if any(run["failed_batches"] for run in runs) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""
+Checkpoints for translation jobs.
+
+A job is one (system prompt, list of chunks) combination. Every batch that
+finishes is written to SQLite straight away, so a failed, interrupted or
+refreshed job can be resumed by re-requesting only the batches that are
+still missing - even after a server restart.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from translation_cache import DEFAULT_CACHE_DIR
+
+
+def make_job_id(system_prompt, chunks):
+    h = hashlib.sha256(system_prompt.encode("utf-8"))
+    for chunk in chunks:
+        h.update(b"\0")
+        h.update(chunk.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class JobStore:
+    """Thread-safe SQLite store of jobs and their finished batches."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_age_days=14):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "jobs.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    source_text TEXT NOT NULL,
+                    system_prompt TEXT NOT NULL,
+                    chunks TEXT NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    updated REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS batches (
+                    job_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (job_id, idx)
+                );
+            """)
+            # Forget old jobs
+            cutoff = time.time() - max_age_days * 24 * 3600
+            self._conn.execute("DELETE FROM batches WHERE job_id IN (SELECT job_id FROM jobs WHERE updated < ?)", (cutoff,))
+            self._conn.execute("DELETE FROM jobs WHERE updated < ?", (cutoff,))
+            self._conn.commit()
+
+    def start_job(self, source_text, system_prompt, chunks):
+        """Registers the job (or picks up an existing one). Returns its job ID."""
+        job_id = make_job_id(system_prompt, chunks)
+        title = " ".join(source_text.split())[:80]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, title, source_text, system_prompt, chunks, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, title, source_text, system_prompt, json.dumps(chunks), time.time())
+            )
+            self._conn.execute("UPDATE jobs SET updated = ? WHERE job_id = ?", (time.time(), job_id))
+            self._conn.commit()
+        return job_id
+
+    def save_batch(self, job_id, idx, result):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO batches (job_id, idx, result) VALUES (?, ?, ?)",
+                (job_id, idx, result)
+            )
+            self._conn.execute("UPDATE jobs SET updated = ? WHERE job_id = ?", (time.time(), job_id))
+            self._conn.commit()
+
+    def finish_job(self, job_id):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET done = 1, updated = ? WHERE job_id = ?", (time.time(), job_id))
+            self._conn.commit()
+
+    def load_job(self, job_id):
+        """Returns the job as a dict with 'results' in chunk order (None = missing), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, source_text, system_prompt, chunks, done, updated FROM jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            saved = self._conn.execute(
+                "SELECT idx, result FROM batches WHERE job_id = ?", (job_id,)
+            ).fetchall()
+
+        chunks = json.loads(row[3])
+        results = [None] * len(chunks)
+        for idx, result in saved:
+            results[idx] = result
+        return {
+            "job_id": job_id,
+            "title": row[0],
+            "source_text": row[1],
+            "system_prompt": row[2],
+            "chunks": chunks,
+            "results": results,
+            "missing": [i for i, r in enumerate(results) if r is None],
+            "done": bool(row[4]),
+            "updated": row[5],
+        }
+
+    def unfinished_jobs(self, limit=10):
+        """Most recent jobs that still have missing batches: (job_id, title, saved, total, updated)."""
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT j.job_id, j.title, j.chunks, j.updated,
+                       (SELECT COUNT(*) FROM batches b WHERE b.job_id = j.job_id)
+                FROM jobs j WHERE j.done = 0
+                ORDER BY j.updated DESC LIMIT ?
+            """, (limit,)).fetchall()
+        return [(job_id, title, saved, len(json.loads(chunks)), updated)
+                for job_id, title, chunks, updated, saved in rows]
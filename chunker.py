@@ -0,0 +1,191 @@
+"""
+Token-budget-aware text chunker.
+
+Chunks are sized by estimated tokens (input plus the expected output) rather
+than characters. Lines are kept whole where possible; a line that is too long
+on its own is broken at sentence ends, then clause boundaries, then spaces.
+Everything is a single left-to-right pass, so chunking is linear in the text.
+"""
+import difflib
+import re
+
+DEFAULT_TOKEN_BUDGET = 8000 # Input + expected output, per batch
+OUTPUT_RATIO = 2.0          # Output echoes the Yiddish and adds the English
+
+HEBREW_RUN_RE = re.compile(r'[\u0590-\u05FF\uFB1D-\uFB4F]+')
+
+# Each pattern matches the text to keep at the END of a piece
+BREAK_PATTERNS = [
+    re.compile(r'[.?!:\u05C3]+["\'\u201D\u05F4)]*\s+'),  # Sentence ends (incl. sof-pasuk)
+    re.compile(r'[,;]\s+|\s+[-\u2013\u2014]+\s+'),        # Clauses and dashes
+    re.compile(r'\s+'),                                  # Words
+]
+
+
+def estimate_tokens(text):
+    """
+    Rough token count. Hebrew script (incl. nikud) runs ~2 characters per
+    token, Latin text and punctuation ~4.
+    """
+    hebrew = sum(len(run) for run in HEBREW_RUN_RE.findall(text))
+    return int(hebrew / 2 + (len(text) - hebrew) / 4) + 1
+
+
+def max_input_tokens(token_budget):
+    """Share of the budget left for the chunk itself once output is accounted for."""
+    return max(1, int(token_budget / (1 + OUTPUT_RATIO)))
+
+
+def _cut(text, pattern):
+    """Splits text after every match of pattern; the pieces concatenate back to text."""
+    pieces = []
+    start = 0
+    for match in pattern.finditer(text):
+        if match.end() < len(text):
+            pieces.append(text[start:match.end()])
+            start = match.end()
+    pieces.append(text[start:])
+    return pieces
+
+
+def break_line(line, max_tokens, level=0):
+    """Breaks an over-budget line into pieces of at most max_tokens (where possible)."""
+    if estimate_tokens(line) <= max_tokens:
+        return [line]
+
+    if level == len(BREAK_PATTERNS):
+        # No boundary left at all: hard split by characters
+        step = max(1, len(line) * max_tokens // estimate_tokens(line))
+        return [line[i:i + step] for i in range(0, len(line), step)]
+
+    pieces = []
+    current = ""
+    current_tokens = 0
+    for piece in _cut(line, BREAK_PATTERNS[level]):
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            pieces.append(current)
+            current = ""
+            current_tokens = 0
+        current += piece
+        current_tokens += tokens
+    pieces.append(current)
+
+    # Any piece still too big has no boundary of this kind: try the next one
+    return [p for piece in pieces for p in break_line(piece, max_tokens, level + 1)]
+
+
+def iter_units(text, max_tokens):
+    """
+    Yields (piece, ends_line) units: whole lines, or pieces of over-budget
+    lines. text may also be an iterable of lines (e.g. ingest.iter_lines).
+    """
+    for line in text.split('\n') if isinstance(text, str) else text:
+        pieces = break_line(line, max_tokens)
+        for k, piece in enumerate(pieces):
+            yield piece, k == len(pieces) - 1
+
+
+def split_units(text, max_tokens):
+    return list(iter_units(text, max_tokens))
+
+
+def join_units(units):
+    parts = []
+    for piece, ends_line in units:
+        parts.append(piece)
+        if ends_line:
+            parts.append('\n')
+    if units and units[-1][1]:
+        parts.pop()
+    return "".join(parts)
+
+
+def group_units(units, max_tokens):
+    """Greedily packs units into chunks of at most max_tokens (newlines count as a token)."""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for unit in units:
+        tokens = estimate_tokens(unit[0]) + 1
+        # If adding this unit exceeds the budget (and chunk isn't empty), save chunk
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(join_units(current))
+            current = []
+            current_tokens = 0
+        current.append(unit)
+        current_tokens += tokens
+
+    # Append remainder
+    if current:
+        chunks.append(join_units(current))
+    return chunks
+
+
+def split_in_half(text):
+    """Splits text into two chunks of about equal tokens (or returns [text] if it can't be split)."""
+    units = split_units(text, max(1, estimate_tokens(text) // 8)) # Fine-grained, for an even cut
+    if len(units) < 2:
+        return [text]
+
+    half = sum(estimate_tokens(piece) + 1 for piece, _ in units) / 2
+    running = 0
+    for k, (piece, _) in enumerate(units[:-1]):
+        running += estimate_tokens(piece) + 1
+        if running >= half:
+            break
+    return [join_units(units[:k + 1]), join_units(units[k + 1:])]
+
+
+def split_text_smartly(text, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Splits text into chunks whose input plus expected output fits token_budget,
+    breaking on newlines (or sentence / clause boundaries inside long lines).
+    text may be a string or an iterable of lines, which is consumed as it goes.
+    """
+    max_tokens = max_input_tokens(token_budget)
+    return group_units(iter_units(text, max_tokens), max_tokens)
+
+
+def split_text_incrementally(text, prev_chunks, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Like split_text_smartly, but any previous chunk whose units still appear
+    unchanged is kept as-is. Only the regions around an edit are re-split,
+    so chunk boundaries after the edit don't shift.
+    """
+    if not prev_chunks:
+        return split_text_smartly(text, token_budget)
+
+    max_tokens = max_input_tokens(token_budget)
+    new_units = split_units(text, max_tokens)
+    prev_units = []
+    prev_spans = []
+    for chunk in prev_chunks:
+        start = len(prev_units)
+        prev_units.extend(split_units(chunk, max_tokens))
+        prev_spans.append((start, len(prev_units)))
+
+    # Map each unchanged old unit to its new position
+    matcher = difflib.SequenceMatcher(None, prev_units, new_units, autojunk=False)
+    unit_map = {}
+    for a, b, size in matcher.get_matching_blocks():
+        for k in range(size):
+            unit_map[a + k] = b + k
+
+    chunks = []
+    pos = 0
+    for start, end in prev_spans:
+        new_start = unit_map.get(start)
+        if new_start is None or new_start < pos:
+            continue
+        if all(unit_map.get(start + k) == new_start + k for k in range(end - start)):
+            # Re-split whatever changed in between, then keep the old chunk
+            if new_start > pos:
+                chunks.extend(group_units(new_units[pos:new_start], max_tokens))
+            chunks.append(join_units(new_units[new_start:new_start + end - start]))
+            pos = new_start + end - start
+
+    if pos < len(new_units):
+        chunks.extend(group_units(new_units[pos:], max_tokens))
+
+    return chunks
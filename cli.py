@@ -0,0 +1,339 @@
+"""
+Headless batch mode: translate a whole directory (or glob) of transcripts.
+
+    python cli.py transcripts/ -o translated/
+    python cli.py "transcripts/**/*.docx" -o translated/ --workers 4
+
+One output is written per input file, plus manifest.json in the output
+directory. A file is skipped when the manifest shows it was already
+translated from identical content with the same prompt and format, and the
+output is still there. All files share one rate limiter and one cap on
+concurrent API requests.
+"""
+import argparse
+import collections
+import concurrent.futures
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from chunker import DEFAULT_TOKEN_BUDGET, split_text_smartly
+from exporters import TEXT_EXPORTS, build_docx
+from ingest import READ_BLOCK, UnreadableFile, iter_lines
+from metrics import summarize, to_jsonl
+from pipeline import API_BASE_URL, MODELS, HttpClient, run_batches
+from row_store import RowStore
+from key_pool import ApiKeyPool
+from routing import ModelRouter
+from prompts import DEFAULT_PROMPT
+from scheduler import RequestScheduler
+from translation_cache import TranslationCache
+from translation_memory import TranslationMemory
+
+INPUT_EXTENSIONS = (".docx", ".txt")
+MANIFEST_NAME = "manifest.json"
+
+
+def is_inside(path, directory):
+    return os.path.commonpath([os.path.abspath(path), directory]) == directory
+
+
+def find_inputs(patterns, exclude=None):
+    """
+    Expands directories (recursively) and glob patterns into a sorted list of
+    transcripts. Nothing under the exclude directory (the output) is included.
+    """
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                if exclude:
+                    dirs[:] = [d for d in dirs if not is_inside(os.path.join(root, d), exclude)]
+                paths.update(os.path.join(root, f) for f in files)
+        else:
+            paths.update(glob.glob(pattern, recursive=True))
+    return sorted(os.path.abspath(p) for p in paths
+                  if os.path.isfile(p) and p.lower().endswith(INPUT_EXTENSIONS)
+                  and not (exclude and is_inside(p, exclude)))
+
+
+def output_paths(inputs, base_dir, output_dir, extension):
+    """
+    Mirrors the input tree under output_dir. Inputs that would otherwise
+    share an output (a.txt and a.docx) keep their own extension in its name
+    (a.txt.srt, a.docx.srt).
+    """
+    names = {p: os.path.relpath(p, base_dir) for p in inputs}
+    stems = {p: os.path.normcase(os.path.splitext(name)[0]) for p, name in names.items()}
+    shared = {stem for stem, count in collections.Counter(stems.values()).items() if count > 1}
+    return {
+        p: os.path.join(output_dir, (name if stems[p] in shared else os.path.splitext(name)[0]) + "." + extension)
+        for p, name in names.items()
+    }
+
+
+def sha256_hex(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path):
+    """SHA-256 of a file, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_atomically(path, data):
+    """
+    Writes to a temp file first, so a crash never leaves a half-written output.
+    data is bytes, or an iterable of str pieces written out as UTF-8 as they come.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        if isinstance(data, bytes):
+            f.write(data)
+        else:
+            for piece in data:
+                f.write(piece.encode("utf-8"))
+    os.replace(tmp_path, path)
+
+
+def translate_file(input_path, output_path, args, system_prompt, scheduler, cache, client, memory, router,
+                   key_pool):
+    """Translates one transcript. Returns its manifest entry."""
+    started = time.time()
+    entry = {"input": input_path, "output": output_path, "status": "failed"}
+
+    entry["input_sha256"] = sha256_file(input_path)
+
+    # The file is streamed straight into the chunker, never held whole
+    try:
+        with open(input_path, "rb") as f:
+            chunks = split_text_smartly(iter_lines(f), args.token_budget)
+    except UnreadableFile:
+        chunks = []
+    if not any(chunk.strip() for chunk in chunks):
+        entry["error"] = "Unreadable or empty file"
+        return entry
+    reports = []
+    results, errors = run_batches(
+        chunks, system_prompt, key_pool.keys[0],
+        max_workers=args.batch_workers,
+        cache=cache,
+        read_cache=not args.no_cache,
+        scheduler=scheduler,
+        client=client,
+        json_output=args.json_output,
+        fill_gaps=not args.no_fill_gaps,
+        fix_subtitles=not args.no_fix_subtitles,
+        memory=memory,
+        router=router,
+        key_pool=key_pool,
+        cache_prompt=not args.no_prompt_cache,
+        on_report=lambda i, report: reports.append(report)
+    )
+    entry["batches"] = len(chunks)
+    entry["seconds"] = round(time.time() - started, 2)
+    records = [dict(report["metrics"], input=input_path) for report in reports if report.get("metrics")]
+    summary = summarize(records)
+    for name in ("requests", "retries", "prompt_tokens", "output_tokens"):
+        entry[name] = summary[name]
+    entry["batch_metrics"] = records # Taken out by main() for --metrics, not kept in the manifest
+    if errors or any(r is None for r in results):
+        entry["error"] = "; ".join(f"Batch {i + 1}: {e}" for i, e in sorted(errors.items())) \
+            or "Cancelled"
+        return entry
+
+    raw_text = "\n".join(results)
+    rows = RowStore.from_output(raw_text)
+    if args.format == "docx":
+        write_atomically(output_path, build_docx(rows))
+    elif args.format in TEXT_EXPORTS:
+        write_atomically(output_path, TEXT_EXPORTS[args.format](rows))
+    else:
+        write_atomically(output_path, raw_text.encode("utf-8"))
+
+    entry["status"] = "done"
+    entry["rows"] = len(rows)
+    gaps = [gap for report in reports for gap in report.get("gaps", [])]
+    subtitles = [report["subtitles"] for report in reports if report.get("subtitles")]
+    entry["gaps_filled"] = sum(gap["filled"] for gap in gaps)
+    entry["gaps_missing"] = [gap["text"] for gap in gaps if not gap["filled"]]
+    entry["memory_lines_reused"] = sum(report.get("memory", {}).get("reused_lines", 0) for report in reports)
+    entry["subtitle_rows_fixed"] = sum(s["fixed_locally"] + s["fixed_by_model"] for s in subtitles)
+    entry["subtitle_rows_failing"] = [
+        {"yiddish": yiddish, "english": english, "problems": problems}
+        for s in subtitles for _, yiddish, english, problems in s["still_failing"]
+    ]
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Translate a directory of Yiddish transcripts into subtitles.")
+    parser.add_argument("inputs", nargs="+", help="Directories, files or glob patterns (.docx / .txt)")
+    parser.add_argument("-o", "--output-dir", required=True)
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY"),
+                        help="Comma-separated to spread the work over several keys' quotas. "
+                             "Defaults to $GOOGLE_API_KEY / $GEMINI_API_KEY")
+    parser.add_argument("--format", choices=["docx", "srt", "vtt", "csv", "txt"], default="docx",
+                        help="docx table, srt / vtt subtitles (provisional timings), csv, or the raw model output")
+    parser.add_argument("--prompt-file", help="System prompt to use instead of the built-in one")
+    parser.add_argument("--workers", type=int, default=2, help="Files translated at the same time")
+    parser.add_argument("--batch-workers", type=int, default=4, help="Batches in parallel per file")
+    parser.add_argument("--max-concurrent", type=int, default=8, help="API requests in flight across all files")
+    parser.add_argument("--rpm", type=int, default=60, help="Requests per minute, per key")
+    parser.add_argument("--tpm", type=int, default=1_000_000, help="Tokens per minute, per key")
+    parser.add_argument("--retries", type=int, default=5, help="Retries per batch")
+    parser.add_argument("--connect-timeout", type=float, default=10, help="Seconds to wait for a connection")
+    parser.add_argument("--read-timeout", type=float, default=300, help="Seconds the API may go silent mid-response")
+    parser.add_argument("--base-url", default=API_BASE_URL,
+                        help="API server; point at a local stand-in to run offline (default: $GEMINI_BASE_URL)")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET, help="Tokens per batch")
+    parser.add_argument("--json-output", action="store_true",
+                        help="Request rows as structured JSON instead of the '|' table")
+    parser.add_argument("--no-fill-gaps", action="store_true",
+                        help="Don't re-request source lines the model skipped")
+    parser.add_argument("--no-fix-subtitles", action="store_true",
+                        help="Don't re-break or repair rows that break the 42-character / two-line rules")
+    parser.add_argument("--no-prompt-cache", action="store_true",
+                        help="Send the system prompt with every request instead of caching it for the run")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Don't reuse or add to the translation memory of past jobs")
+    parser.add_argument("--models", default=",".join(MODELS),
+                        help="Comma-separated models in order of preference (fallback and hedge target)")
+    parser.add_argument("--hedge-percentile", type=int, default=95,
+                        help="Hedge a request to the next model once it's slower than this percentile")
+    parser.add_argument("--max-hedge-share", type=float, default=0.1,
+                        help="Cost cap: hedges as a share of all requests")
+    parser.add_argument("--no-hedge", action="store_true", help="Never send hedged requests")
+    parser.add_argument("--no-cache", action="store_true", help="Don't reuse cached chunk translations")
+    parser.add_argument("--metrics", help="Append per-batch timings and token counts to this JSON-lines file")
+    parser.add_argument("--force", action="store_true", help="Re-translate files even if their output is current")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("No API key: pass --api-key or set GOOGLE_API_KEY")
+
+    system_prompt = DEFAULT_PROMPT
+    if args.prompt_file:
+        with open(args.prompt_file, encoding="utf-8") as f:
+            system_prompt = f.read()
+    prompt_sha256 = sha256_hex(system_prompt.encode("utf-8"))
+
+    output_dir = os.path.abspath(args.output_dir)
+    inputs = find_inputs(args.inputs, exclude=output_dir)
+    if not inputs:
+        print("No .docx or .txt files found.", file=sys.stderr)
+        return 1
+
+    base_dir = os.path.commonpath([os.path.dirname(p) for p in inputs])
+    outputs = output_paths(inputs, base_dir, output_dir, args.format)
+    taken = {}
+    for path, output in outputs.items():
+        other = taken.setdefault(os.path.normcase(output), path)
+        if other != path:
+            print(f"{other} and {path} would both be written to {output}.", file=sys.stderr)
+            return 1
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = {e["input"]: e for e in json.load(f).get("files", [])}
+
+    def is_current(path):
+        entry = previous.get(path)
+        if args.force or not entry or entry.get("status") != "done":
+            return False
+        if entry.get("prompt_sha256") != prompt_sha256 or entry.get("output") != outputs[path] \
+                or entry.get("json_output", False) != args.json_output:
+            return False
+        if not os.path.exists(outputs[path]):
+            return False
+        return sha256_file(path) == entry.get("input_sha256")
+
+    entries = {}
+    todo = []
+    for path in inputs:
+        if is_current(path):
+            entries[path] = dict(previous[path], skipped=True)
+        else:
+            todo.append(path)
+    print(f"{len(inputs)} files: {len(todo)} to translate, {len(inputs) - len(todo)} already current.",
+          file=sys.stderr)
+
+    key_pool = ApiKeyPool(args.api_key.split(","), args.rpm, args.tpm)
+    scheduler = RequestScheduler(args.rpm * len(key_pool), args.tpm * len(key_pool), args.retries,
+                                 max_concurrent=args.max_concurrent)
+    cache = TranslationCache()
+    memory = None if args.no_memory else TranslationMemory()
+    router = ModelRouter([m.strip() for m in args.models.split(",") if m.strip()],
+                         args.hedge_percentile, args.max_hedge_share, hedging=not args.no_hedge)
+    client = HttpClient(args.base_url, args.connect_timeout, args.read_timeout,
+                        pool_size=max(args.max_concurrent, args.workers * args.batch_workers))
+    lock = threading.Lock()
+    started = time.time()
+
+    def write_manifest():
+        files = [entries[p] for p in inputs if p in entries]
+        manifest = {
+            "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "format": args.format,
+            "total": len(inputs),
+            "done": sum(e["status"] == "done" for e in files),
+            "failed": sum(e["status"] != "done" for e in files),
+            "seconds": round(time.time() - started, 2),
+            "files": files,
+        }
+        write_atomically(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            executor.submit(translate_file, p, outputs[p], args, system_prompt, scheduler, cache, client, memory,
+                            router, key_pool): p
+            for p in todo
+        }
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                entry = {"input": path, "output": outputs[path], "status": "failed", "error": str(e)}
+            entry["prompt_sha256"] = prompt_sha256
+            entry["json_output"] = args.json_output
+            records = entry.pop("batch_metrics", [])
+            with lock:
+                entries[path] = entry
+                write_manifest() # After every file, so an interrupted run keeps its progress
+                if args.metrics and records:
+                    with open(args.metrics, "a", encoding="utf-8") as f:
+                        f.write(to_jsonl(records))
+
+            label = os.path.relpath(path, base_dir)
+            if entry["status"] == "done":
+                print(f"✅ {label}: {entry['rows']} rows in {entry['seconds']}s", file=sys.stderr)
+            else:
+                print(f"❌ {label}: {entry.get('error')}", file=sys.stderr)
+
+    write_manifest()
+    routing_stats = router.stats()
+    print(f"Hedged {routing_stats['hedges']} of {routing_stats['requests']} requests "
+          f"({routing_stats['hedge_wins']} answered first).", file=sys.stderr)
+    if len(key_pool) > 1:
+        for k in key_pool.stats():
+            print(f"Key {k['key']}: {k['requests']} requests, {k['rate_limited']} rate limited, "
+                  f"{k['errors']} errors ({k['health']})", file=sys.stderr)
+    failed = sum(e["status"] != "done" for e in entries.values())
+    print(f"Done in {time.time() - started:.1f}s. {failed} failed. Manifest: {manifest_path}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Exports of a finished job's rows (see row_store.RowStore).
+
+DOCX is built in memory, with python-docx imported on first use. SRT,
+WebVTT and CSV are produced by generators that read straight from the row
+store, so they can be written to a file piece by piece. In every format
+the '~' line breaks become real line breaks. The transcripts carry no
+timestamps, so subtitle cues get provisional timings from reading speed,
+ready to be synced in the editor.
+"""
+import csv
+import io
+import re
+
+READING_CHARS_PER_SECOND = 17
+MIN_CUE_SECONDS = 1.5
+MAX_CUE_SECONDS = 7.0
+
+BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+
+
+def build_docx(rows):
+    """DOCX with a 3-column table: ID, Yiddish, English (with '~' as real line breaks)."""
+    from docx import Document # Only loaded once someone exports a DOCX
+
+    doc = Document()
+    table = doc.add_table(rows=1, cols=3)
+    table.style = 'Table Grid'
+    for row in rows.records():
+        cells = table.add_row().cells
+        cells[0].text = row['id']
+        cells[1].text = row['yiddish']
+        cells[2].text = row['english_raw']
+
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+
+def cue_lines(english):
+    """Subtitle lines of a row's English, with **bold** as <b> tags."""
+    return [BOLD_RE.sub(r'<b>\1</b>', line.strip()) for line in english.split("~") if line.strip()]
+
+
+def cue_times(rows):
+    """(start, end) seconds for each row, back to back, sized by reading speed."""
+    start = 0.0
+    for english in rows.english:
+        chars = len(english.replace("~", " ").replace("**", ""))
+        end = start + min(MAX_CUE_SECONDS, max(MIN_CUE_SECONDS, chars / READING_CHARS_PER_SECOND))
+        yield start, end
+        start = end
+
+
+def timestamp(seconds, separator):
+    millis = round(seconds * 1000)
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def iter_srt(rows):
+    """Yields an SRT file cue by cue."""
+    for i, (start, end) in enumerate(cue_times(rows)):
+        lines = "\n".join(cue_lines(rows.english[i]))
+        yield f"{i + 1}\n{timestamp(start, ',')} --> {timestamp(end, ',')}\n{lines}\n\n"
+
+
+def iter_vtt(rows):
+    """Yields a WebVTT file cue by cue (cue IDs are the row IDs)."""
+    yield "WEBVTT\n\n"
+    for i, (start, end) in enumerate(cue_times(rows)):
+        lines = "\n".join(cue_lines(rows.english[i]))
+        yield f"{rows.row_id(i)}\n{timestamp(start, '.')} --> {timestamp(end, '.')}\n{lines}\n\n"
+
+
+def iter_csv(rows):
+    """Yields a CSV file (ID, Yiddish, English) row by row, with a BOM so Excel reads it as UTF-8."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(("ID", "Yiddish", "English"))
+    for record in rows.records():
+        writer.writerow((record['id'], record['yiddish'], record['english_raw']))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue() # Just the header if there are no rows
+
+
+# File extension -> generator of the file's text
+TEXT_EXPORTS = {"srt": iter_srt, "vtt": iter_vtt, "csv": iter_csv}
+
+# Label -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "DOCX": ("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    "SRT": ("srt", "application/x-subrip"),
+    "WebVTT": ("vtt", "text/vtt"),
+    "CSV": ("csv", "text/csv"),
+}
+
+
+def export_rows(rows, extension):
+    """The whole export for one of EXPORT_FORMATS' extensions, as bytes."""
+    if extension == "docx":
+        return build_docx(rows)
+    return "".join(TEXT_EXPORTS[extension](rows)).encode("utf-8")
@@ -0,0 +1,179 @@
+"""
+Reading transcripts: .docx, or plain text (UTF-8, then the Hebrew
+Windows-1255 code page).
+
+The format is told from the first bytes of the file, so it is read only
+once. A .docx is streamed: document.xml is parsed incrementally, paragraph
+by paragraph (table cells included), followed by the footnotes and
+endnotes. Plain text is decoded in blocks. iter_lines() yields the text
+line by line, so the chunker can consume it without the whole document
+ever being held as bytes and text at the same time.
+"""
+import codecs
+import io
+import xml.etree.ElementTree as ET
+import zipfile
+
+READ_BLOCK = 1 << 20 # Bytes decoded at a time
+
+ZIP_MAGIC = b"PK\x03\x04"
+OLE_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1" # Legacy .doc (Word 97-2003)
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+TEXT_ENCODINGS = ["utf-8", "cp1255"]
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+NOTE_PARTS = [("word/footnotes.xml", W + "footnote"), ("word/endnotes.xml", W + "endnote")]
+
+
+class UnreadableFile(ValueError):
+    pass
+
+
+def detect_format(head):
+    """'docx', 'doc' or 'text' from a file's first bytes."""
+    if head.startswith(ZIP_MAGIC):
+        return "docx"
+    if head.startswith(OLE_MAGIC):
+        return "doc"
+    return "text"
+
+
+def _paragraph_text(p):
+    """Text of one w:p, as python-docx gives it (tabs and breaks included)."""
+    parts = []
+    for el in p.iter():
+        if el.tag == W + "t":
+            parts.append(el.text or "")
+        elif el.tag == W + "tab":
+            parts.append("\t")
+        elif el.tag in (W + "br", W + "cr"):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _iter_paragraphs(part, skip_in=None):
+    """
+    Yields the text of every paragraph of an XML part in document order,
+    clearing each one once read so memory stays flat. Paragraphs inside a
+    skip_in element with a w:type (Word's separator notes) are left out, and
+    so are the old-format copies of text boxes (mc:Fallback).
+    """
+    skipping = False
+    fallback_depth = 0
+    for event, el in ET.iterparse(part, events=("start", "end")):
+        if el.tag == skip_in:
+            if event == "start":
+                skipping = el.get(W + "type") is not None
+        elif el.tag == MC_FALLBACK:
+            fallback_depth += 1 if event == "start" else -1
+        elif event == "end" and el.tag == W + "p":
+            if not skipping and not fallback_depth:
+                yield _paragraph_text(el)
+            el.clear() # Also keeps text-box paragraphs from repeating in their parent
+
+
+def _batched(paragraphs):
+    """Joins paragraph texts with newlines into blocks of about READ_BLOCK characters."""
+    batch = []
+    size = 0
+    for text in paragraphs:
+        batch.append(text)
+        size += len(text) + 1
+        if size >= READ_BLOCK:
+            yield "\n".join(batch) + "\n"
+            batch = []
+            size = 0
+    yield "\n".join(batch)
+
+
+def iter_docx_blocks(fileobj):
+    """Text of a .docx in blocks: body paragraphs and table cells, then footnotes and endnotes."""
+    def paragraphs(zf):
+        names = set(zf.namelist())
+        with zf.open("word/document.xml") as part:
+            yield from _iter_paragraphs(part)
+        for name, note_tag in NOTE_PARTS:
+            if name in names:
+                with zf.open(name) as part:
+                    yield from _iter_paragraphs(part, skip_in=note_tag)
+
+    try:
+        with zipfile.ZipFile(fileobj) as zf:
+            yield from _batched(paragraphs(zf))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        raise UnreadableFile(str(e)) from e
+
+
+def decodes_as(fileobj, encoding):
+    """True if the whole file decodes as encoding (checked block by block, nothing kept)."""
+    fileobj.seek(0)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        while True:
+            block = fileobj.read(READ_BLOCK)
+            decoder.decode(block, final=not block)
+            if not block:
+                return True
+    except UnicodeDecodeError:
+        return False
+
+
+def iter_decoded_blocks(fileobj, encoding):
+    """Text of a plain-text file, decoded READ_BLOCK bytes at a time (CRLF becomes LF)."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    held = "" # A trailing CR, in case its LF is in the next block
+    while True:
+        block = fileobj.read(READ_BLOCK)
+        text = held + decoder.decode(block, final=not block)
+        held = "\r" if block and text.endswith("\r") else ""
+        yield text[:len(text) - len(held)].replace("\r\n", "\n")
+        if not block:
+            break
+
+
+def iter_blocks(fileobj):
+    """
+    Yields the text of a .docx or .txt file object (which must be seekable)
+    in blocks that concatenate to the whole text. Raises UnreadableFile if it
+    is neither, or is a legacy .doc.
+    """
+    fileobj.seek(0)
+    head = fileobj.read(len(OLE_MAGIC))
+    fileobj.seek(0)
+    kind = detect_format(head)
+    if kind == "doc":
+        raise UnreadableFile("Legacy .doc file")
+    if kind == "docx":
+        yield from iter_docx_blocks(fileobj)
+        return
+
+    encodings = [enc for bom, enc in BOMS if head.startswith(bom)][:1] or TEXT_ENCODINGS
+    for encoding in encodings:
+        if decodes_as(fileobj, encoding):
+            fileobj.seek(0)
+            yield from iter_decoded_blocks(fileobj, encoding)
+            return
+    raise UnreadableFile("Not a .docx, and not UTF-8 or Windows-1255 text")
+
+
+def iter_lines(fileobj):
+    """Yields the lines of a .docx or .txt file object, for the chunker (see iter_blocks)."""
+    pending = ""
+    for block in iter_blocks(fileobj):
+        *lines, pending = (pending + block).split("\n")
+        yield from lines
+    yield pending
+
+
+def extract_text(source):
+    """Returns the text of a .docx or .txt file (bytes or a file object), or None if it can't be read."""
+    fileobj = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    try:
+        return "".join(iter_blocks(fileobj))
+    except UnreadableFile:
+        return None
@@ -0,0 +1,153 @@
+"""
+Process-wide background runner for translation jobs.
+
+Jobs run on a shared thread pool outside any Streamlit script run, so they
+keep going through reruns, widget clicks and closed tabs. The UI submits a
+job under its ID and then polls status() for progress and the rows that
+have streamed in so far. How many jobs run at once is capped here; how many
+API requests are in flight across all jobs is capped by the shared
+RequestScheduler.
+"""
+import concurrent.futures
+import threading
+import time
+
+from pipeline import iter_rows, run_batches
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobRunner:
+
+    def __init__(self, max_jobs=4, keep_finished=50):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_jobs, thread_name_prefix="translation-job"
+        )
+        self.keep_finished = keep_finished
+        self._jobs = {} # job_id -> state dict
+        self._lock = threading.Lock()
+
+    def submit(self, job_id, chunks, system_prompt, api_key, known_results=None, on_finished=None, **options):
+        """
+        Queues a job (options are passed on to run_batches). If the same job
+        is already queued or running, nothing new is started. on_finished(status)
+        is called from the job thread when it ends.
+        """
+        known_results = dict(known_results or {})
+        with self._lock:
+            existing = self._jobs.get(job_id)
+            if existing and existing["state"] in ACTIVE_STATES:
+                return job_id
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "state": "queued",
+                "total": len(chunks),
+                "completed": len(known_results),
+                "rows": {}, # batch index -> [(yiddish, english), ...] streamed so far
+                "results": None,
+                "errors": {},
+                "reports": {}, # batch index -> quality report (dropped spans, subtitle repairs)
+                "system_prompt": system_prompt,
+                "chunks": chunks,
+                "cancel": threading.Event(),
+                "submitted": time.time(),
+                "started": None,
+                "finished": None,
+            }
+            self._prune()
+
+        self._executor.submit(self._run, job_id, chunks, system_prompt, api_key,
+                              known_results, on_finished, options)
+        return job_id
+
+    def _run(self, job_id, chunks, system_prompt, api_key, known_results, on_finished, options):
+        job = self._jobs[job_id]
+        with self._lock:
+            job["state"] = "running"
+            job["started"] = time.time()
+
+        def on_line(i, line):
+            with self._lock:
+                if line is None:
+                    job["rows"][i] = [] # Batch is being retried
+                    return
+                job["rows"].setdefault(i, []).extend(iter_rows(line))
+
+        def on_batch_done(i, completed, total, success, result):
+            with self._lock:
+                job["completed"] = completed
+                if not success:
+                    job["errors"][i] = result
+
+        def on_report(i, report):
+            with self._lock:
+                job["reports"][i] = report
+
+        try:
+            results, errors = run_batches(
+                chunks, system_prompt, api_key,
+                known_results=known_results,
+                cancel_event=job["cancel"],
+                on_batch_done=on_batch_done,
+                on_line=on_line,
+                on_report=on_report,
+                **options
+            )
+        except Exception as e:
+            results, errors = [None] * len(chunks), {-1: str(e)}
+
+        with self._lock:
+            job["results"] = results
+            job["errors"].update(errors)
+            if job["cancel"].is_set():
+                job["state"] = "cancelled"
+            elif errors or any(r is None for r in results):
+                job["state"] = "failed"
+            else:
+                job["state"] = "done"
+            job["finished"] = time.time()
+
+        if on_finished:
+            on_finished(self.status(job_id))
+
+    def _prune(self):
+        """Forgets the oldest finished jobs beyond keep_finished (call with the lock held)."""
+        finished = sorted(
+            (job["finished"], job_id) for job_id, job in self._jobs.items()
+            if job["state"] not in ACTIVE_STATES
+        )
+        for _, job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def status(self, job_id):
+        """Snapshot of a job (safe to use from any thread), or None if unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {
+                "job_id": job_id,
+                "state": job["state"],
+                "total": job["total"],
+                "completed": job["completed"],
+                "rows": [pair for i in sorted(job["rows"]) for pair in job["rows"][i]],
+                "results": list(job["results"]) if job["results"] is not None else None,
+                "errors": dict(job["errors"]),
+                "reports": dict(job["reports"]),
+                "system_prompt": job["system_prompt"],
+                "chunks": job["chunks"],
+                "submitted": job["submitted"],
+                "started": job["started"],
+                "finished": job["finished"],
+            }
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["cancel"].set()
+
+    def stats(self):
+        with self._lock:
+            states = [job["state"] for job in self._jobs.values()]
+        return {"queued": states.count("queued"), "running": states.count("running")}
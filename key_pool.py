@@ -0,0 +1,129 @@
+"""
+Pool of Gemini API keys, so one job can use the quota of several keys.
+
+Every key has its own requests-per-minute and tokens-per-minute buckets.
+A request goes to the ready key with the most room left in its bucket.
+A key that gets a 429 cools down for the server's Retry-After, or for a
+backoff that grows with each repeat. A key that keeps failing pauses
+briefly, and a key the API rejects (401/403) is set aside for a long time.
+"""
+import threading
+import time
+
+from scheduler import TokenBucket
+
+RATE_LIMIT_COOLDOWN = 30.0   # Seconds after a 429 without a Retry-After hint (doubles on repeats)
+ERROR_COOLDOWN = 15.0        # After FAILURES_BEFORE_COOLDOWN network / 5xx errors in a row
+FAILURES_BEFORE_COOLDOWN = 3
+INVALID_COOLDOWN = 600.0     # After the API rejects the key
+MAX_IDLE_WAIT = 60.0         # Longer than this for a ready key: use the least-bad one anyway
+
+
+def mask_key(key):
+    return f"…{key[-4:]}" if len(key) > 4 else "…"
+
+
+class ApiKeyPool:
+    """Thread-safe; shared by every job that uses the same set of keys."""
+
+    def __init__(self, keys, requests_per_minute=60, tokens_per_minute=1_000_000):
+        self.keys = list(dict.fromkeys(k.strip() for k in keys if k and k.strip()))
+        self._lock = threading.Lock()
+        self._buckets = {k: (TokenBucket(requests_per_minute), TokenBucket(tokens_per_minute)) for k in self.keys}
+        self._state = {
+            k: {"requests": 0, "ok": 0, "rate_limited": 0, "errors": 0, "in_flight": 0,
+                "failures_in_row": 0, "cooldown_until": 0.0, "invalid": False}
+            for k in self.keys
+        }
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _ready_in(self, now, exclude=None):
+        """Seconds until some key (other than exclude) is out of cooldown (call with the lock held)."""
+        waits = [max(0.0, s["cooldown_until"] - now) for k, s in self._state.items() if k != exclude]
+        return min(waits) if waits else None
+
+    def acquire(self, estimated_tokens=0):
+        """Picks a key for one request, waiting for its rate limits (and for a cooldown to end if all are cooling)."""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                ready = [k for k in self.keys if self._state[k]["cooldown_until"] <= now]
+                if not ready and now - started >= MAX_IDLE_WAIT:
+                    ready = [min(self.keys, key=lambda k: self._state[k]["cooldown_until"])]
+                if ready:
+                    key = max(ready, key=lambda k: (self._buckets[k][0].available(), -self._state[k]["in_flight"]))
+                    self._state[key]["in_flight"] += 1
+                    self._state[key]["requests"] += 1
+                    break
+                wait = self._ready_in(now)
+            time.sleep(min(wait, 1.0))
+
+        request_bucket, token_bucket = self._buckets[key]
+        request_bucket.acquire(1)
+        token_bucket.acquire(estimated_tokens)
+        return key
+
+    def release(self, key, meta):
+        """
+        Records how a request on key went (from call_api's meta) and updates
+        its health. On a 429 or a rejected key, meta is adjusted so the
+        scheduler retries right away if another key is ready.
+        """
+        status = meta.get("status")
+        with self._lock:
+            state = self._state[key]
+            state["in_flight"] -= 1
+            if status == "cancelled":
+                return # Never sent
+            now = time.monotonic()
+            if status == 200:
+                state["ok"] += 1
+                state["failures_in_row"] = 0
+                state["invalid"] = False
+                return
+
+            if status == 429:
+                state["failures_in_row"] += 1
+                state["rate_limited"] += 1
+                cooldown = meta.get("retry_after") or RATE_LIMIT_COOLDOWN * 2 ** min(state["failures_in_row"] - 1, 3)
+                state["cooldown_until"] = now + cooldown
+            elif status in (401, 403):
+                state["failures_in_row"] += 1
+                state["errors"] += 1
+                state["invalid"] = True
+                state["cooldown_until"] = now + INVALID_COOLDOWN
+            elif status is None or (isinstance(status, int) and status >= 500):
+                state["failures_in_row"] += 1
+                state["errors"] += 1
+                if state["failures_in_row"] >= FAILURES_BEFORE_COOLDOWN:
+                    state["cooldown_until"] = now + ERROR_COOLDOWN
+            else:
+                return # Not the key's fault (e.g. a 400 for the request itself)
+
+            other_ready_in = self._ready_in(now, exclude=key)
+        if other_ready_in is not None and other_ready_in < state["cooldown_until"] - now:
+            meta["retry_after"] = other_ready_in
+            if status in (401, 403):
+                meta["retry_other_key"] = True
+
+    def stats(self):
+        """Per-key usage and health, with the keys masked."""
+        now = time.monotonic()
+        with self._lock:
+            rows = []
+            for key in self.keys:
+                state = self._state[key]
+                cooling = max(0.0, state["cooldown_until"] - now)
+                if state["invalid"] and cooling:
+                    health = "rejected"
+                elif cooling:
+                    health = f"cooling {cooling:.0f}s"
+                else:
+                    health = "ok"
+                rows.append({"key": mask_key(key), "requests": state["requests"], "ok": state["ok"],
+                             "rate_limited": state["rate_limited"], "errors": state["errors"],
+                             "in_flight": state["in_flight"], "health": health})
+            return rows
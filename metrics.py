@@ -0,0 +1,120 @@
+"""
+Per-batch performance metrics.
+
+Every batch gets a BatchMetrics that the scheduler and the request code
+fill in as they go: time spent queued behind the rate limits and
+concurrency cap, time on the wire, retries and backoff, the token counts
+Gemini reports in usageMetadata, the finishReason and the model that
+answered. Gap fills, halves and subtitle repairs for the batch are counted
+in the same record. summarize() rolls a job's records up into totals and
+percentiles; to_jsonl() exports them one batch per line.
+"""
+import collections
+import json
+import threading
+import time
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of values, or None if there are none."""
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class BatchMetrics:
+    """Thread-safe counters for one batch (a hedged request fills it from two threads)."""
+
+    def __init__(self, batch, chars=0, retry_budget=None):
+        """retry_budget caps the retries of all the batch's requests together (None = no cap)."""
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.retry_budget = retry_budget
+        self.record = {
+            "batch": batch,
+            "chars": chars,
+            "cached": False,
+            "requests": 0,
+            "retries": 0,
+            "queue_wait": 0.0,    # Seconds waiting for the rate limiter / a slot
+            "backoff": 0.0,       # Seconds sleeping between retries
+            "latency": 0.0,       # Seconds on the wire, summed over requests
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+            "thought_tokens": 0,
+            "cached_tokens": 0,
+            "finish_reason": None,
+            "model": None,
+            "seconds": 0.0,       # Wall time of the whole batch
+        }
+
+    def add_wait(self, seconds):
+        with self._lock:
+            self.record["queue_wait"] += seconds
+
+    def add_retry(self, delay):
+        """Counts one retry; False (and nothing counted) if the batch's retry budget is used up."""
+        with self._lock:
+            if self.retry_budget is not None and self.record["retries"] >= self.retry_budget:
+                return False
+            self.record["retries"] += 1
+            self.record["backoff"] += delay
+            return True
+
+    def add_request(self, model, meta, seconds, success):
+        """One answered (or failed) request, with the meta dict call_api filled."""
+        usage = meta.get("usage") or {}
+        with self._lock:
+            record = self.record
+            record["requests"] += 1
+            record["latency"] += seconds
+            record["prompt_tokens"] += usage.get("promptTokenCount", 0)
+            record["output_tokens"] += usage.get("candidatesTokenCount", 0)
+            record["thought_tokens"] += usage.get("thoughtsTokenCount", 0)
+            record["cached_tokens"] += usage.get("cachedContentTokenCount", 0)
+            if success: # A cancelled hedge may also have had a 200
+                record["model"] = model
+                record["finish_reason"] = meta.get("finish_reason") or record["finish_reason"]
+
+    def mark_cached(self, model):
+        with self._lock:
+            self.record["cached"] = True
+            self.record["model"] = model
+
+    def as_dict(self):
+        """Snapshot of the record, with the batch's wall time so far."""
+        with self._lock:
+            record = dict(self.record)
+        record["seconds"] = time.monotonic() - self._started
+        for name in ("queue_wait", "backoff", "latency", "seconds"):
+            record[name] = round(record[name], 3)
+        return record
+
+
+def summarize(records):
+    """Job totals plus p50/p95/max of the per-batch timings, for a list of batch records."""
+    records = list(records)
+    sent = [r for r in records if r["requests"]]
+    summary = {
+        "batches": len(records),
+        "cached": sum(r["cached"] for r in records),
+        "requests": sum(r["requests"] for r in records),
+        "retries": sum(r["retries"] for r in records),
+        "prompt_tokens": sum(r["prompt_tokens"] for r in records),
+        "output_tokens": sum(r["output_tokens"] for r in records),
+        "thought_tokens": sum(r["thought_tokens"] for r in records),
+        "cached_tokens": sum(r.get("cached_tokens", 0) for r in records),
+        "finish_reasons": dict(collections.Counter(r["finish_reason"] for r in sent if r["finish_reason"])),
+        "models": dict(collections.Counter(r["model"] for r in records if r["model"])),
+    }
+    for name in ("queue_wait", "latency", "seconds"):
+        values = [r[name] for r in sent]
+        summary[name] = {"p50": percentile(values, 50), "p95": percentile(values, 95),
+                         "max": max(values) if values else None, "total": round(sum(values), 3)}
+    return summary
+
+
+def to_jsonl(records):
+    """One JSON object per batch record, newline-terminated."""
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
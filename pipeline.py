@@ -0,0 +1,751 @@
+"""
+Translation pipeline: Gemini API calls, the parallel batch dispatcher and
+the results parser. Kept free of Streamlit so it can run outside a script
+run (background jobs, command line).
+"""
+import bisect
+import concurrent.futures
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from chunker import estimate_tokens, split_in_half
+from metrics import BatchMetrics
+from prompt_cache import PromptCache
+from scheduler import parse_retry_after
+from prompts import REPAIR_PROMPT
+from source_coverage import align_rows, last_line_covered, uncovered_spans
+from subtitle_rules import repair_rows
+from translation_cache import make_key
+
+# --- HELPER: RESULT PARSER ---
+def parse_row(line):
+    """Returns (yiddish, english) for an 'ID | Yiddish | English' line, else None."""
+    if "|" in line and "ID |" not in line and "---" not in line:
+        parts = line.split('|')
+        if len(parts) >= 3:
+            return parts[1].strip(), parts[2].strip()
+    return None
+
+def build_rows(pairs):
+    """Turns (yiddish, english) pairs into display rows with sequential IDs across all batches."""
+    data = []
+    for yiddish, english in pairs:
+        data.append({
+            "id": f"{len(data) + 1:03d}", # Clean ID: 001, 002...
+            "yiddish": yiddish,
+            "english_clean": english.replace("~", " "),
+            "english_raw": english.replace("~", "\n")
+        })
+    return data
+
+def is_json_result(text):
+    """True for output from structured JSON mode (see ROWS_SCHEMA)."""
+    return text.lstrip().startswith("{")
+
+def json_rows(doc):
+    """(yiddish, english) pairs from a decoded ROWS_SCHEMA object; line breaks become '~'."""
+    for row in doc.get("rows", []) if isinstance(doc, dict) else []:
+        if not isinstance(row, dict):
+            continue
+        lines = row.get("english_lines") or []
+        if isinstance(lines, str):
+            lines = [lines]
+        english = "~".join(line.strip() for line in lines if line and line.strip())
+        yield str(row.get("source", "")).strip(), english
+
+def iter_rows(raw_text):
+    """
+    Yields (yiddish, english) for every row in raw output. Structured JSON
+    batches are decoded as a whole (so pipes, dashes and wrapped lines in the
+    text survive); pipe-delimited lines are parsed one by one. The two can be
+    mixed, e.g. cached batches from before JSON mode was switched on.
+    """
+    decoder = json.JSONDecoder()
+    pos = 0
+    skipping = False # Inside a JSON batch that didn't decode (e.g. cut off)
+    while pos < len(raw_text):
+        if raw_text.startswith("{", pos):
+            try:
+                doc, pos = decoder.raw_decode(raw_text, pos)
+                yield from json_rows(doc)
+                skipping = False
+                continue
+            except ValueError:
+                skipping = True
+        end = raw_text.find("\n", pos)
+        if end == -1:
+            end = len(raw_text)
+        line = raw_text[pos:end]
+        if skipping and line[:1] in ("", " ", "\t", "\"", "}", "]", "{"):
+            pass
+        else:
+            skipping = False
+            row = parse_row(line)
+            if row:
+                yield row
+        pos = end + 1
+
+def result_lines(result):
+    """Splits a finished batch into the pieces passed to on_line callbacks (a JSON batch stays whole)."""
+    return [result] if is_json_result(result) else result.split('\n')
+
+# --- HTTP CLIENT ---
+# Set GEMINI_BASE_URL to a local stand-in server (e.g. http://127.0.0.1:8765) to run offline
+API_BASE_URL = os.environ.get("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+CONNECT_TIMEOUT = float(os.environ.get("GEMINI_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.environ.get("GEMINI_READ_TIMEOUT", "300")) # Max silence between bytes, not total time
+POOL_SIZE = 32
+
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"}
+]
+
+# Structured output mode: the API returns rows as JSON instead of a pipe table
+ROWS_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "rows": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "source": {"type": "STRING", "description": "The Yiddish/Hebrew source snippet, verbatim"},
+                    "english_lines": {
+                        "type": "ARRAY",
+                        "items": {"type": "STRING"},
+                        "description": "The English subtitle, one item per subtitle line"
+                    }
+                },
+                "required": ["source", "english_lines"]
+            }
+        }
+    },
+    "required": ["rows"]
+}
+JSON_OUTPUT_NOTE = (
+    "\n\nOUTPUT FORMAT OVERRIDE: Return the rows as JSON matching the response schema instead of a table. "
+    "Put each subtitle line of the English in its own english_lines item instead of using '~'."
+)
+
+class HttpClient:
+    """
+    Keep-alive connection pool for the API, so batches after the first skip
+    the TCP + TLS handshake. Safe to share between threads.
+    """
+
+    def __init__(self, base_url=API_BASE_URL, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, pool_size=POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+    def post(self, path, body, stream=False):
+        return self.session.post(self.base_url + path, data=body, stream=stream, timeout=self.timeout)
+
+    def delete(self, path):
+        return self.session.delete(self.base_url + path, timeout=self.timeout)
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_default_client():
+    """Process-wide client used when the caller doesn't pass its own."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
+
+def system_instruction(system_prompt, json_output=False):
+    """The system prompt as sent, with the JSON override appended in JSON mode."""
+    return system_prompt + (JSON_OUTPUT_NOTE if json_output else "")
+
+def make_body_prefix(system_prompt, json_output=False, cached_content=None):
+    """
+    Serializes the request body up to the start of the user text, once per
+    job. The system prompt goes in systemInstruction, or, given the name of
+    a cachedContents resource holding it (see prompt_cache), only that name
+    is sent. finish_body() appends each batch's text, so the prompt isn't
+    re-encoded for every request.
+    With json_output the response is requested as JSON following ROWS_SCHEMA.
+    """
+    settings = {"safetySettings": SAFETY_SETTINGS}
+    if json_output:
+        settings["generationConfig"] = {"responseMimeType": "application/json", "responseSchema": ROWS_SCHEMA}
+    if cached_content:
+        settings["cachedContent"] = cached_content
+    elif system_prompt:
+        settings["systemInstruction"] = {"parts": [{"text": system_instruction(system_prompt, json_output)}]}
+    head = json.dumps(settings)[:-1]
+    return (head + ', "contents": [{"role": "user", "parts": [{"text": "').encode("ascii")
+
+def finish_body(prefix, text):
+    """Completes a make_body_prefix() prefix into a full JSON body with the user text."""
+    return prefix + (json.dumps(text)[1:-1] + '"}]}]}').encode("ascii")
+
+# --- API FUNCTION (SYNC) ---
+def call_api(model_name, api_key, full_prompt, meta=None, stream=False, on_line=None, body=None, client=None,
+             cancel=None):
+    """
+    Returns (success, text_or_error). If a meta dict is given it is filled with
+    the HTTP 'status' (None on network errors and timeouts), any server
+    'retry_after' hint, the candidate's 'finish_reason' (e.g. "STOP" or
+    "MAX_TOKENS") and the response's 'usage' (Gemini's usageMetadata token counts).
+    With stream=True the streamGenerateContent (SSE) endpoint is used and
+    on_line(line) is called for every complete output line as it arrives.
+    A prebuilt body (see finish_body) is sent as is instead of full_prompt.
+    Setting the cancel event stops reading a streamed response.
+    """
+    if meta is None:
+        meta = {}
+    meta['status'] = None
+    if client is None:
+        client = get_default_client()
+    if stream:
+        path = f"/v1beta/{model_name}:streamGenerateContent?alt=sse&key={api_key}"
+    else:
+        path = f"/v1beta/{model_name}:generateContent?key={api_key}"
+    if body is None:
+        body = finish_body(make_body_prefix(None), full_prompt)
+
+    try:
+        response = client.post(path, body, stream=stream)
+        meta['status'] = response.status_code
+        if response.status_code == 200 and stream:
+            return read_stream(response, on_line, meta, cancel)
+        elif response.status_code == 200:
+            result_json = response.json()
+            meta['usage'] = result_json.get('usageMetadata')
+            try:
+                candidate = result_json['candidates'][0]
+                meta['finish_reason'] = candidate.get('finishReason')
+                text = candidate['content']['parts'][0]['text']
+                return True, text
+            except (KeyError, IndexError):
+                return False, f"Parsed JSON but found no text: {result_json}"
+        elif response.status_code == 404:
+            return False, "NOT_FOUND"
+        else:
+            meta['retry_after'] = parse_retry_after(response.headers, response.text)
+            return False, f"Error {response.status_code}: {response.text}"
+    except requests.RequestException as e:
+        # Also mid-stream, after the 200: a dropped or stalled stream is retried like any network error
+        meta['status'] = None
+        return False, str(e)
+    except Exception as e:
+        return False, str(e)
+
+def read_stream(response, on_line=None, meta=None, cancel=None):
+    """Collects text from an SSE response, passing each finished line to on_line."""
+    if meta is None:
+        meta = {}
+    text_parts = []
+    pending = ""
+    for raw in response.iter_lines():
+        if cancel is not None and cancel.is_set():
+            response.close()
+            return False, "Cancelled"
+        # Split on bytes, then decode: UTF-8 never puts a newline byte inside a character
+        raw = raw.decode("utf-8")
+        if not raw.startswith("data:"):
+            continue
+        event = json.loads(raw[5:])
+        if event.get('usageMetadata'):
+            meta['usage'] = event['usageMetadata'] # Running totals; the last event has the final counts
+        try:
+            candidate = event['candidates'][0]
+            if candidate.get('finishReason'):
+                meta['finish_reason'] = candidate['finishReason']
+            piece = candidate['content']['parts'][0]['text']
+        except (KeyError, IndexError):
+            continue # e.g. the final event that only carries finishReason
+        text_parts.append(piece)
+        if on_line:
+            *complete, pending = (pending + piece).split('\n')
+            for line in complete:
+                on_line(line)
+
+    if on_line and pending:
+        on_line(pending)
+
+    text = "".join(text_parts)
+    if not text:
+        return False, "Stream ended without any text"
+    return True, text
+
+# --- BATCH DISPATCHER (PARALLEL) ---
+MODELS = ["models/gemini-2.5-flash", "models/gemini-1.5-flash"] # Primary, then backup
+MAX_SPLIT_DEPTH = 3 # A truncated chunk is halved at most this many times (<= 8 pieces)
+MAX_GAPS = 12 # Dropped spans re-requested per batch; beyond this they are only reported
+
+def is_truncated(chunk, result, finish_reason):
+    """True if the model ran out of output tokens or stopped before the end of the chunk."""
+    if finish_reason == "MAX_TOKENS":
+        return True
+    if not chunk.strip():
+        return False
+    snippets = [row[0] for row in iter_rows(result)]
+    return not snippets or not last_line_covered(chunk, snippets)
+
+def format_rows(pairs, json_output=False):
+    """Writes (yiddish, english) pairs back out in the batch output format."""
+    if json_output:
+        rows = [{"source": yiddish, "english_lines": english.split("~")} for yiddish, english in pairs]
+        return json.dumps({"rows": rows}, ensure_ascii=False)
+    return "\n".join(f"{n} | {yiddish} | {english}" for n, (yiddish, english) in enumerate(pairs, 1))
+
+def fill_coverage_gaps(chunk, result, translate_span, json_output=False, gaps=None):
+    """
+    Finds the parts of chunk that no row of result covers, translates them
+    all in one translate_span(text) -> (success, result) call (one gap per
+    line) and splices the new rows in at their place in the source. More
+    than MAX_GAPS gaps means the rows hardly line up with the source, so
+    they are only reported. Every gap found is appended to gaps as
+    {'start', 'end', 'text', 'filled'}. Returns the merged result.
+    """
+    rows = list(iter_rows(result))
+    spans = align_rows(chunk, [yiddish for yiddish, _ in rows])
+    found = uncovered_spans(chunk, spans)
+    texts = [chunk[start:end] for start, end in found]
+    gap_rows = [[] for _ in found]
+    if found and len(found) <= MAX_GAPS:
+        joined = "\n".join(texts)
+        success, gap_result = translate_span(joined)
+        new_rows = list(iter_rows(gap_result)) if success else []
+        # Each new row belongs to the gap its snippet is found in (unplaced ones follow the row before)
+        gap_ends = list(itertools.accumulate(len(text) + 1 for text in texts))
+        g = 0
+        for row, span in zip(new_rows, align_rows(joined, [yiddish for yiddish, _ in new_rows])):
+            if span is not None:
+                g = min(bisect.bisect_right(gap_ends, span[0]), len(found) - 1)
+            gap_rows[g].append(row)
+
+    inserts = {} # Row index -> gap rows that go before it
+    for (start, end), text, new_rows in zip(found, texts, gap_rows):
+        if gaps is not None:
+            gaps.append({"start": start, "end": end, "text": text, "filled": bool(new_rows)})
+        if new_rows:
+            # After the last row that starts before the gap
+            at = max((i + 1 for i, span in enumerate(spans) if span is not None and span[0] < start), default=0)
+            inserts.setdefault(at, []).extend(new_rows)
+
+    if not inserts:
+        return result
+    merged = []
+    for i, row in enumerate(rows):
+        merged.extend(inserts.get(i, []))
+        merged.append(row)
+    merged.extend(inserts.get(len(rows), []))
+    return format_rows(merged, json_output)
+
+def merge_known_rows(chunk, result, known, json_output=False):
+    """
+    Puts rows reused from the translation memory (known: [(offset, rows)])
+    back among the freshly translated rows of result, in source order.
+    """
+    rows = list(iter_rows(result))
+    placed = []
+    offset = 0
+    for n, (row, span) in enumerate(zip(rows, align_rows(chunk, [yiddish for yiddish, _ in rows]))):
+        if span is not None:
+            offset = span[0]
+        placed.append((offset, 1, n, row)) # Unplaced rows stay after the row before them
+    for n, (line_offset, line_rows) in enumerate(known):
+        placed += [(line_offset, 0, n, row) for row in line_rows]
+    return format_rows([row for *_, row in sorted(placed, key=lambda p: p[:3])], json_output)
+
+def format_hints(hints):
+    """Prompt section with translation-memory rows that resemble this batch."""
+    if not hints:
+        return ""
+    lines = "\n".join(f"{yiddish} | {english}" for yiddish, english in hints)
+    return ("TRANSLATION MEMORY (approved earlier translations of similar passages; "
+            "keep their terminology where the meaning matches, but translate this text on its own terms):\n"
+            + lines)
+
+def key_chooser(api_key, key_pool, estimated_tokens, cancel=None):
+    """
+    prepare hook for RequestScheduler.submit: puts the key for one request in
+    meta['api_key'], either api_key or one taken from key_pool (an
+    ApiKeyPool), which may wait for that key's own limits. Runs before a
+    concurrency slot is taken, so that wait doesn't hold one.
+    """
+    def prepare(meta):
+        if cancel is None or not cancel.is_set():
+            meta['api_key'] = key_pool.acquire(estimated_tokens) if key_pool is not None else api_key
+    return prepare
+
+def release_key(key_pool, meta):
+    """Hands a pooled key back, telling the pool how its request went (call_api's meta)."""
+    if key_pool is not None and meta.get('api_key') is not None:
+        key_pool.release(meta['api_key'], meta)
+
+def with_key(key_pool, meta, request):
+    """Runs request(key) with the key key_chooser() picked, then releases it."""
+    try:
+        return request(meta['api_key'])
+    finally:
+        release_key(key_pool, meta)
+
+def submit_request(scheduler, send, prepare, estimated_tokens=0, metrics=None):
+    """Runs send(meta) after prepare(meta): under the scheduler (see RequestScheduler.submit), or once without one."""
+    if scheduler is not None:
+        return scheduler.submit(send, estimated_tokens, metrics, prepare=prepare)
+    meta = {}
+    prepare(meta)
+    return send(meta)
+
+def request_subtitle_repair(task, api_key, scheduler=None, client=None, models=MODELS, key_pool=None,
+                            metrics=None):
+    """Sends the rows that still break the subtitle rules to the model in one small request."""
+    body = finish_body(make_body_prefix(REPAIR_PROMPT), task)
+    estimated_tokens = estimate_tokens(REPAIR_PROMPT) + 2 * estimate_tokens(task)
+    for model_name in models:
+        def send(meta):
+            started = time.monotonic()
+            success, result = with_key(key_pool, meta,
+                                       lambda key: call_api(model_name, key, None, meta, body=body, client=client))
+            if metrics is not None:
+                metrics.add_request(model_name, meta, time.monotonic() - started, success)
+            return success, result
+        success, result = submit_request(scheduler, send, key_chooser(api_key, key_pool, estimated_tokens),
+                                         estimated_tokens, metrics)
+        if success or result != "NOT_FOUND":
+            break
+    return success, result
+
+def replay_lines(on_line, result):
+    """Replaces the rows already passed to on_line with those of result."""
+    if on_line:
+        on_line(None)
+        for line in result_lines(result):
+            on_line(line)
+
+def translate_chunk(chunk, batch_num, total_chunks, system_prompt, api_key, cache=None, read_cache=True,
+                    scheduler=None, stream=False, on_line=None, split_depth=0, body_prefix=None, client=None,
+                    json_output=False, fill_gaps=True, fix_subtitles=True, memory=None, router=None,
+                    key_pool=None, report=None, metrics=None, prompt_cache=None):
+    """
+    Translates one chunk, falling back to the backup model if needed. With a
+    router (see routing.ModelRouter) its model list is used instead and slow
+    requests are hedged to the next model. With a key_pool (see
+    key_pool.ApiKeyPool) every request uses the best available key from it
+    instead of api_key.
+    Cached results (keyed by model, prompt, chunk text and the checks that
+    ran on them) skip the API entirely.
+    With a scheduler, requests are rate limited and transient errors retried.
+    on_line(line) gets each output line as it arrives; on_line(None) means a
+    new attempt started and lines from the previous one should be dropped.
+    If the output was truncated, the chunk is split in half and each half is
+    translated on its own, then the rows are merged.
+    With json_output the rows come back as JSON (see ROWS_SCHEMA); on_line
+    then gets the whole batch once it is complete instead of line by line.
+    With fill_gaps, source text that no output row covers is re-requested on
+    its own and merged in (see fill_coverage_gaps). With fix_subtitles, rows
+    that break the subtitle rules are re-broken locally or, failing that,
+    repaired by the model (see subtitle_rules.repair_rows).
+    With a translation memory, lines it already knows are reused instead of
+    sent, similar passages are added to the prompt as hints, and the final
+    rows are stored in it. A report dict, if given, receives the 'gaps'
+    found, the 'subtitles' repair summary and the 'memory' lines/hints used.
+    Every request made for the chunk (halves, gap fills and repairs
+    included) is counted in metrics, a metrics.BatchMetrics, if given.
+    With a prompt_cache (see prompt_cache.PromptCache) requests refer to the
+    job's cached system prompt instead of sending it.
+    """
+    def cache_key(model_name):
+        # JSON and pipe output are cached separately, and so are results that skipped
+        # the gap fill or the subtitle rules, so a hit never bypasses a check that's on
+        checks = ("+json" if json_output else "") + ("+gaps" if fill_gaps else "") \
+            + ("+rules" if fix_subtitles and split_depth == 0 else "")
+        return make_key(model_name + checks, system_prompt, chunk)
+
+    models = router.models if router is not None else MODELS
+    if cache is not None and read_cache:
+        for model_name in models:
+            cached = cache.get(cache_key(model_name))
+            if cached is not None:
+                if metrics is not None and split_depth == 0:
+                    metrics.mark_cached(model_name)
+                if on_line:
+                    for line in result_lines(cached):
+                        on_line(line)
+                return True, cached
+
+    # Lines the translation memory already has aren't sent at all
+    to_send, known, hints = chunk, [], []
+    if memory is not None and split_depth == 0:
+        to_send, known = memory.split_known(chunk)
+        hints = memory.hints(to_send)
+        if report is not None:
+            report['memory'] = {'reused_lines': len(known), 'hints': len(hints)}
+
+    if body_prefix is None:
+        body_prefix = make_body_prefix(system_prompt, json_output)
+    # The user turn: memory hints (if any), then the text; the system prompt travels separately
+    task = f"TASK: Translate this text part ({batch_num}/{total_chunks}):\n{to_send}"
+    if hints:
+        task = f"{format_hints(hints)}\n\n---\n\n{task}"
+    body = finish_body(body_prefix, task)
+
+    estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(task)
+
+    def attempt(model_name, lines, cancel, on_send=None):
+        """
+        One request to model_name (with the scheduler's retries): (success, result, meta).
+        on_send(True/False) is called as the request goes out and comes back (see routing.ModelRouter.run).
+        """
+        attempt_meta = {}
+
+        def send(meta):
+            if cancel is not None and cancel.is_set():
+                meta['status'] = "cancelled" # Not retryable
+                release_key(key_pool, meta)
+                return False, "Cancelled"
+            if lines:
+                lines(None)
+            attempt_meta.clear()
+            started = time.monotonic()
+            def request(key):
+                # Partial JSON can't be shown, so JSON batches are only passed on once complete
+                def send_body(request_body):
+                    if on_send is not None:
+                        on_send(True)
+                    try:
+                        return call_api(model_name, key, None, meta, stream=stream,
+                                        on_line=None if json_output else lines, body=request_body,
+                                        client=client, cancel=cancel)
+                    finally:
+                        if on_send is not None:
+                            on_send(False)
+
+                cached_prefix = prompt_cache.prefix(model_name, key) if prompt_cache is not None else None
+                if cached_prefix is None:
+                    return send_body(body)
+                success, result = send_body(finish_body(cached_prefix, task))
+                if not success and meta.get('status') in (400, 403, 404):
+                    prompt_cache.invalidate(model_name, key) # Expired or rejected: send the prompt inline
+                    success, result = send_body(body)
+                return success, result
+
+            success, result = with_key(key_pool, meta, request)
+            attempt_meta.update(meta)
+            if metrics is not None:
+                metrics.add_request(model_name, meta, time.monotonic() - started, success)
+            if success and router is not None:
+                router.record(model_name, time.monotonic() - started, estimated_tokens)
+            if success and json_output and lines:
+                lines(result)
+            return success, result
+
+        success, result = submit_request(scheduler, send, key_chooser(api_key, key_pool, estimated_tokens, cancel),
+                                         estimated_tokens, metrics)
+        return success, result, attempt_meta
+
+    model_name = models[0]
+    last_meta = {}
+    if not to_send.strip():
+        success, result = True, "" # Every line came from the translation memory
+    elif router is not None:
+        success, result, last_meta, model_name = router.run(attempt, estimated_tokens, on_line)
+        if success and last_meta.get('hedged'):
+            replay_lines(on_line, result) # The hedge won; its rows weren't streamed
+    else:
+        for model_name in models:
+            success, result, last_meta = attempt(model_name, on_line, None)
+            # Retry Logic (Backup Model)
+            if success or result != "NOT_FOUND":
+                break
+
+    # Truncated, whether or not a router sent it: re-request the two halves instead
+    # (they are checked again themselves)
+    finish_reason = last_meta.get('finish_reason')
+    if (success or finish_reason == "MAX_TOKENS") and split_depth < MAX_SPLIT_DEPTH \
+            and is_truncated(to_send, result if success else "", finish_reason):
+        halves = split_in_half(to_send)
+        if len(halves) == 2:
+            if on_line:
+                on_line(None)
+            # Halves stream into the same batch, so they must not reset each other's rows
+            half_on_line = (lambda line: line is not None and on_line(line)) if on_line else None
+            half_results = []
+            for half in halves:
+                if not half.strip():
+                    continue
+                success, result = translate_chunk(half, batch_num, total_chunks, system_prompt, api_key,
+                                                  cache, read_cache, scheduler, stream, half_on_line,
+                                                  split_depth + 1, body_prefix, client, json_output,
+                                                  fill_gaps=False, # Checked once the halves are merged
+                                                  router=router, key_pool=key_pool, metrics=metrics,
+                                                  prompt_cache=prompt_cache)
+                if not success:
+                    return success, result
+                half_results.append(result)
+            success, result = True, "\n".join(half_results)
+
+    if success and known:
+        result = merge_known_rows(chunk, result, known, json_output)
+        replay_lines(on_line, result)
+
+    # Dropped lines: re-request just those spans
+    if success and fill_gaps:
+        def translate_span(text):
+            return translate_chunk(text, batch_num, total_chunks, system_prompt, api_key, cache, read_cache,
+                                   scheduler, split_depth=MAX_SPLIT_DEPTH, body_prefix=body_prefix,
+                                   client=client, json_output=json_output, fill_gaps=False, router=router,
+                                   key_pool=key_pool, metrics=metrics, prompt_cache=prompt_cache)
+
+        gaps = report.setdefault('gaps', []) if report is not None else None
+        filled = fill_coverage_gaps(chunk, result, translate_span, json_output, gaps)
+        if filled != result:
+            result = filled
+            replay_lines(on_line, result)
+
+    # Subtitle rules (line length, balance, empty English); halves are checked once merged
+    if success and fix_subtitles and split_depth == 0:
+        rows = list(iter_rows(result))
+        fixed_rows, summary = repair_rows(
+            rows, lambda task: request_subtitle_repair(task, api_key, scheduler, client, models, key_pool,
+                                                  metrics)
+        )
+        if report is not None and summary['flagged']:
+            report['subtitles'] = summary
+        if fixed_rows != rows:
+            result = format_rows(fixed_rows, json_output)
+            replay_lines(on_line, result)
+
+    if success and memory is not None and split_depth == 0:
+        memory.learn(chunk, list(iter_rows(result)))
+
+    if success and cache is not None:
+        cache.put(cache_key(model_name), result)
+
+    return success, result
+
+def run_batches(chunks, system_prompt, api_key, max_workers=4, cache=None, read_cache=True,
+                known_results=None, scheduler=None, stream=False, checkpoint=None,
+                cancel_event=None, on_started=None, on_batch_done=None, on_line=None, client=None,
+                json_output=False, fill_gaps=True, fix_subtitles=True, memory=None, router=None,
+                key_pool=None, on_report=None, cache_prompt=False):
+    """
+    Sends all chunks to the API with at most max_workers requests in flight.
+    Chunks whose index is in known_results are not sent again.
+    checkpoint(i, result) is called from the worker thread as soon as batch i
+    succeeds, so finished work is saved even if the caller goes away.
+    Setting cancel_event stops any batches that haven't started yet.
+    Returns (results, errors): results is in source order (None where a batch
+    failed or was cancelled), errors maps batch index -> error message.
+    Callbacks run on the calling thread (never on a worker thread).
+    on_line(i, line) receives batch i's output lines as they arrive (see translate_chunk).
+    client is the HttpClient to send with (default: the shared process-wide one).
+    json_output requests structured JSON rows instead of pipe-delimited lines.
+    memory, router and key_pool are an optional TranslationMemory,
+    ModelRouter and ApiKeyPool (see translate_chunk).
+    on_report(i, report) gets batch i's report: source spans the model
+    dropped ('gaps'), subtitle-rule repairs ('subtitles'), translation-memory
+    use ('memory') and its performance record ('metrics', see metrics.BatchMetrics).
+    With cache_prompt the system prompt is registered once per model and key
+    as cached content for the job (see prompt_cache.PromptCache), and deleted
+    when it ends.
+    """
+    total_chunks = len(chunks)
+    results = [None] * total_chunks
+    errors = {}
+    known_results = known_results or {}
+    line_queue = queue.Queue() # Worker threads -> calling thread
+    body_prefix = make_body_prefix(system_prompt, json_output) # Shared by every batch of the job
+    prompt_cache = None
+    if cache_prompt:
+        prompt_cache = PromptCache(system_instruction(system_prompt, json_output), client or get_default_client(),
+                                   lambda name: make_body_prefix(None, json_output, cached_content=name))
+
+    def drain_lines():
+        while on_line and not line_queue.empty():
+            on_line(*line_queue.get())
+
+    def line_sink(i):
+        return (lambda line: line_queue.put((i, line))) if on_line else None
+
+    def run_one(i, chunk):
+        report = {}
+        # "Retries per batch": shared by every request the batch makes
+        batch_metrics = BatchMetrics(i + 1, len(chunk),
+                                     retry_budget=scheduler.max_retries if scheduler is not None else None)
+        success, result = translate_chunk(chunk, i + 1, total_chunks, system_prompt, api_key,
+                                          cache, read_cache, scheduler, stream, line_sink(i),
+                                          body_prefix=body_prefix, client=client, json_output=json_output,
+                                          fill_gaps=fill_gaps, fix_subtitles=fix_subtitles, memory=memory,
+                                          router=router, key_pool=key_pool, report=report,
+                                          metrics=batch_metrics, prompt_cache=prompt_cache)
+        report['metrics'] = batch_metrics.as_dict()
+        if success and checkpoint:
+            checkpoint(i, result)
+        return success, result, report
+
+    for i, result in known_results.items():
+        results[i] = result
+        if on_line:
+            for line in result_lines(result):
+                on_line(i, line)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                executor.submit(run_one, i, chunk): i
+                for i, chunk in enumerate(chunks) if i not in known_results
+            }
+            if on_started and futures:
+                on_started()
+
+            completed = len(known_results)
+            not_done = set(futures)
+            while not_done:
+                done, not_done = concurrent.futures.wait(
+                    not_done, timeout=0.25, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                drain_lines()
+                if cancel_event is not None and cancel_event.is_set():
+                    for f in not_done:
+                        f.cancel()
+                for future in done:
+                    i = futures[future]
+                    if future.cancelled():
+                        continue
+                    try:
+                        success, result, report = future.result()
+                    except Exception as e:
+                        success, result, report = False, str(e), {}
+
+                    completed += 1
+                    if success:
+                        results[i] = result
+                    else:
+                        errors[i] = result
+                        # Stop sending new batches; the job can't complete anyway
+                        for f in futures:
+                            f.cancel()
+
+                    if on_report and report:
+                        on_report(i, report)
+                    if on_batch_done:
+                        on_batch_done(i, completed, total_chunks, success, result)
+
+    finally:
+        if prompt_cache is not None:
+            prompt_cache.close()
+
+    return results, errors
@@ -0,0 +1,73 @@
+"""
+Per-job cachedContents handles for the system prompt.
+
+The system prompt (several KB of rules and examples) is the same for every
+batch of a job. Instead of sending it each time, it is registered once per
+model and API key as a cachedContents resource, and each batch only refers
+to it by name. If the API won't cache it (e.g. the prompt is under the
+model's minimum size) or a handle stops working, batches send the prompt
+inline as systemInstruction instead. Handles are deleted when the job ends.
+"""
+import json
+import threading
+
+CACHE_TTL_SECONDS = 3600 # Outlives any job; deleted at the end anyway
+
+
+class PromptCache:
+    """
+    Thread-safe; one per job. make_prefix(name) builds the request-body
+    prefix that refers to a handle (see pipeline.make_body_prefix).
+    """
+
+    def __init__(self, instruction, client, make_prefix, ttl_seconds=CACHE_TTL_SECONDS):
+        self.instruction = instruction
+        self.client = client
+        self.make_prefix = make_prefix
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._handles = {} # (model, key) -> cachedContents name, or None if it can't be cached
+        self._prefixes = {} # cachedContents name -> body prefix
+
+    def _create(self, model_name, api_key):
+        """Registers the prompt for one model and key. Returns the handle's name, or None."""
+        body = json.dumps({
+            "model": model_name,
+            "systemInstruction": {"parts": [{"text": self.instruction}]},
+            "ttl": f"{self.ttl_seconds}s",
+        }).encode("utf-8")
+        try:
+            response = self.client.post(f"/v1beta/cachedContents?key={api_key}", body)
+            if response.status_code == 200:
+                return response.json().get("name")
+        except Exception:
+            pass
+        return None
+
+    def prefix(self, model_name, api_key):
+        """Body prefix that refers to the cached prompt for this model and key, or None."""
+        with self._lock:
+            if (model_name, api_key) not in self._handles:
+                # Under the lock, so concurrent batches don't register the same prompt twice
+                name = self._create(model_name, api_key)
+                self._handles[model_name, api_key] = name
+                if name:
+                    self._prefixes[name] = self.make_prefix(name)
+            name = self._handles[model_name, api_key]
+            return self._prefixes[name] if name else None
+
+    def invalidate(self, model_name, api_key):
+        """Stops using a handle the API rejected (expired or deleted); the prompt is sent inline from now on."""
+        with self._lock:
+            self._handles[model_name, api_key] = None
+
+    def close(self):
+        """Deletes the job's handles."""
+        with self._lock:
+            handles = [(name, key) for (_, key), name in self._handles.items() if name]
+            self._handles.clear()
+        for name, api_key in handles:
+            try:
+                self.client.delete(f"/v1beta/{name}?key={api_key}")
+            except Exception:
+                pass # They expire on their own
@@ -0,0 +1,156 @@
+"""
+Latency-aware model routing with hedged requests.
+
+The router keeps a rolling window of response times per model, measured
+as seconds per estimated token so that small and large batches are
+comparable. When a request to the primary model takes longer than that
+model's p95 would predict for its size, the same request is also sent to
+the next model in the list. Only time the request is actually out counts,
+not waits for the rate limiter, a key or a retry backoff. Whichever answer
+comes back first is used and the other request is cancelled. A cost cap
+limits hedges to a share of all requests.
+"""
+import collections
+import concurrent.futures
+import threading
+import time
+
+LATENCY_WINDOW = 200   # Recent samples kept per model
+MIN_SAMPLES = 10       # No hedging until the primary has this many samples
+MIN_HEDGE_DELAY = 2.0  # Seconds; never hedge sooner than this
+
+
+class ModelRouter:
+    """Shared by every batch that uses the same model list and hedge settings."""
+
+    def __init__(self, models, hedge_percentile=95, max_hedge_share=0.1, hedging=True, max_parallel=32):
+        self.models = list(models)
+        self.hedge_percentile = hedge_percentile
+        self.max_hedge_share = max_hedge_share
+        self.hedging = hedging
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_parallel,
+                                                               thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+        self._latency = {model: collections.deque(maxlen=LATENCY_WINDOW) for model in self.models}
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, model, seconds, tokens):
+        """Adds one successful response time."""
+        with self._lock:
+            self._latency.setdefault(model, collections.deque(maxlen=LATENCY_WINDOW)).append(
+                seconds / max(1, tokens)
+            )
+
+    def percentile(self, model, p):
+        """Seconds per token at percentile p for model, or None without enough samples."""
+        with self._lock:
+            samples = sorted(self._latency.get(model, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def hedge_delay(self, model, tokens):
+        """How long to wait for model before hedging a request of this size (None = don't hedge)."""
+        rate = self.percentile(model, self.hedge_percentile)
+        if rate is None:
+            return None
+        return max(MIN_HEDGE_DELAY, rate * tokens)
+
+    def _take_hedge(self):
+        """Spends one hedge from the cost cap if there's any left."""
+        with self._lock:
+            if self.hedges + 1 > self.max_hedge_share * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def run(self, attempt, tokens, on_line=None):
+        """
+        Sends a request via attempt(model, on_line, cancel, on_send) -> (success, result, meta),
+        hedging slow requests and falling back to the next model on NOT_FOUND.
+        attempt calls on_send(True) (if given) when its request goes out and
+        on_send(False) when the answer is back; the hedge delay only runs
+        from the latest send while one is out.
+        Returns (success, result, meta, model) for the answer that was used.
+        Only the primary request streams to on_line; if the hedge wins, the
+        caller is told through meta['hedged'] and should replace those lines.
+        """
+        for n, model in enumerate(self.models):
+            alternate = self.models[n + 1] if n + 1 < len(self.models) else None
+            success, result, meta, used = self._hedged(attempt, model, alternate, tokens, on_line)
+            if success or result != "NOT_FOUND":
+                break
+        return success, result, meta, used
+
+    def _hedged(self, attempt, model, alternate, tokens, on_line):
+        with self._lock:
+            self.requests += 1
+        delay = self.hedge_delay(model, tokens) if self.hedging and alternate else None
+        if delay is None:
+            return (*attempt(model, on_line, None, None), model)
+
+        cancels = {model: threading.Event(), alternate: threading.Event()}
+
+        def guarded(cancel):
+            # A cancelled request must not keep streaming into the batch
+            return (lambda line: None if cancel.is_set() else on_line(line)) if on_line else None
+
+        sent_at = []
+        in_flight = threading.Event()
+
+        def on_send(sending):
+            if sending:
+                sent_at.append(time.monotonic())
+                in_flight.set()
+            else:
+                in_flight.clear()
+
+        primary = self._executor.submit(attempt, model, guarded(cancels[model]), cancels[model], on_send)
+        primary.add_done_callback(lambda _: in_flight.set()) # Also ends the wait if it never sends
+        while True:
+            in_flight.wait() # Queued or backing off: the clock isn't running
+            if primary.done():
+                break
+            remaining = sent_at[-1] + delay - time.monotonic()
+            if remaining <= 0 and in_flight.is_set():
+                break
+            try:
+                return (*primary.result(timeout=max(0, remaining)), model)
+            except concurrent.futures.TimeoutError:
+                pass
+        if primary.done() or not self._take_hedge():
+            return (*primary.result(), model)
+
+        hedge = self._executor.submit(attempt, alternate, None, cancels[alternate], None)
+        pending = {primary: model, hedge: alternate}
+        while True:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                used = pending.pop(future)
+                success, result, meta = future.result()
+                if success or not pending:
+                    for other in pending.values():
+                        cancels[other].set()
+                    if used != model:
+                        meta['hedged'] = True
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return success, result, meta, used
+
+    def stats(self):
+        """Per-model sample count and p50/p95 seconds per 1k tokens, plus hedge counts."""
+        models = {}
+        for model in self._latency:
+            p50, p95 = self.percentile(model, 50), self.percentile(model, 95)
+            with self._lock:
+                count = len(self._latency[model])
+            models[model] = {
+                "samples": count,
+                "p50": p50 * 1000 if p50 is not None else None,
+                "p95": p95 * 1000 if p95 is not None else None,
+            }
+        with self._lock:
+            return {"models": models, "requests": self.requests, "hedges": self.hedges,
+                    "hedge_wins": self.hedge_wins}
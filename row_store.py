@@ -0,0 +1,70 @@
+"""
+Compact, column-oriented store of a finished job's subtitle rows.
+
+The raw model output is parsed once, when the job completes, into two
+tuples of strings (Yiddish and English, with '~' line breaks kept). IDs and
+the display forms of the English are derived on demand, so a Streamlit
+rerun only touches the rows it actually shows or exports.
+"""
+import hashlib
+
+from pipeline import iter_rows
+
+
+class RowStore:
+    """Immutable; safe to keep in session state and share between reruns."""
+
+    __slots__ = ("yiddish", "english", "_digest")
+
+    def __init__(self, pairs=()):
+        pairs = list(pairs)
+        self.yiddish = tuple(yiddish for yiddish, _ in pairs)
+        self.english = tuple(english for _, english in pairs)
+        self._digest = None
+
+    @classmethod
+    def from_output(cls, raw_text):
+        """Parses raw model output (pipe-delimited and/or JSON batches)."""
+        return cls(iter_rows(raw_text))
+
+    def __len__(self):
+        return len(self.yiddish)
+
+    def __bool__(self):
+        return bool(self.yiddish)
+
+    def digest(self):
+        """SHA-256 of the rows (computed once), for caching exports and the like."""
+        if self._digest is None:
+            h = hashlib.sha256()
+            for yiddish, english in zip(self.yiddish, self.english):
+                h.update(f"{yiddish}\x1f{english}\x1e".encode("utf-8"))
+            self._digest = h.hexdigest()
+        return self._digest
+
+    @staticmethod
+    def row_id(i):
+        return f"{i + 1:03d}" # Clean ID: 001, 002...
+
+    def record(self, i):
+        """Display row i (see pipeline.build_rows)."""
+        english = self.english[i]
+        return {
+            "id": self.row_id(i),
+            "yiddish": self.yiddish[i],
+            "english_clean": english.replace("~", " "),
+            "english_raw": english.replace("~", "\n"),
+        }
+
+    def records(self, start=0, stop=None):
+        """Display rows for rows start..stop, built as they are read."""
+        for i in range(start, len(self) if stop is None else min(stop, len(self))):
+            yield self.record(i)
+
+    def find(self, query):
+        """Indexes of the rows whose Yiddish or English contains query (case-insensitive)."""
+        query = query.strip().casefold()
+        if not query:
+            return range(len(self))
+        return [i for i, (yiddish, english) in enumerate(zip(self.yiddish, self.english))
+                if query in yiddish.casefold() or query in english.replace("~", " ").casefold()]
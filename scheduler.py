@@ -0,0 +1,161 @@
+"""
+Rate-limit-aware request scheduler for the Gemini API.
+
+Every request first takes its share from two token buckets (requests per
+minute and tokens per minute) and a slot under the shared concurrency cap,
+then is sent. Transient failures (429, 5xx, network errors) are retried with
+exponential backoff and full jitter, honouring the server's Retry-After /
+retryDelay hint, until the per-batch retry budget is used up.
+"""
+import email.utils
+import json
+import random
+import re
+import threading
+import time
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Continuously refilling bucket; callers reserve capacity and sleep off any debt."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Capacity available right now, without taking any."""
+        with self._lock:
+            return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate)
+
+    def acquire(self, amount=1):
+        """Blocks until `amount` is available. Returns the seconds spent waiting."""
+        amount = min(amount, self.capacity)  # Oversized requests wait for a full bucket
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+def parse_retry_after(headers, body=""):
+    """Seconds the server asked us to wait (Retry-After header or Gemini's retryDelay), else None."""
+    value = headers.get("Retry-After") if headers else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                when = email.utils.parsedate_to_datetime(value)
+                return max(0.0, when.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    # Gemini puts it in the error body: {"error": {"details": [{"retryDelay": "37s"}]}}
+    try:
+        for detail in json.loads(body).get("error", {}).get("details", []):
+            match = re.fullmatch(r"([\d.]+)s", str(detail.get("retryDelay", "")))
+            if match:
+                return float(match.group(1))
+    except (ValueError, AttributeError):
+        pass
+    return None
+
+
+class RequestScheduler:
+    """Shared by every batch (and every session) that uses the same limits."""
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=1_000_000,
+                 max_retries=5, base_delay=1.0, max_delay=60.0, max_concurrent=8, slots=None):
+        """slots, a semaphore shared with other schedulers, caps them all together instead of max_concurrent."""
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.slots = slots if slots is not None else threading.BoundedSemaphore(max_concurrent)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lock = threading.Lock()
+        self.queue_depth = 0      # Requests waiting on the rate limiter / a slot
+        self.in_flight = 0        # Requests currently on the wire
+        self.throttle_time = 0.0  # Total seconds spent waiting (limiter + backoff)
+        self.retries = 0
+
+    def _add(self, name, amount):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Server hint if given, else exponential backoff with full jitter."""
+        if retry_after is not None:
+            return min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def submit(self, send, estimated_tokens=0, metrics=None, prepare=None):
+        """
+        Runs send(meta) -> (success, result) under the rate limits, retrying
+        transient failures. send must fill meta['status'] (None for network
+        errors) and may fill meta['retry_after']. meta['retry_other_key']
+        marks an otherwise final failure (e.g. a revoked key) as retryable.
+        prepare(meta), if given, runs before each attempt takes a concurrency
+        slot (e.g. to pick an API key, which may wait on that key's limits);
+        its time counts as queue wait.
+        Queue waits and retries are also added to metrics (a BatchMetrics), if given;
+        its retry_budget then caps the retries of the whole batch, halves, gap
+        fills, repairs and hedges included, on top of max_retries per request.
+        """
+        for attempt in range(self.max_retries + 1):
+            meta = {}
+            self._add("queue_depth", 1)
+            waited = self.request_bucket.acquire(1) + self.token_bucket.acquire(estimated_tokens)
+            if prepare is not None:
+                prepare_start = time.monotonic()
+                prepare(meta)
+                waited += time.monotonic() - prepare_start
+            slot_wait_start = time.monotonic()
+            self.slots.acquire()
+            waited += time.monotonic() - slot_wait_start
+            self._add("queue_depth", -1)
+            self._add("throttle_time", waited)
+            if metrics is not None:
+                metrics.add_wait(waited)
+
+            self._add("in_flight", 1)
+            try:
+                success, result = send(meta)
+            finally:
+                self._add("in_flight", -1)
+                self.slots.release()
+
+            status = meta.get("status")
+            if success or (status is not None and status not in RETRYABLE_STATUSES
+                           and not meta.get("retry_other_key")):
+                return success, result
+            if attempt == self.max_retries:
+                break
+
+            delay = self.backoff_delay(attempt, meta.get("retry_after"))
+            if metrics is not None and not metrics.add_retry(delay):
+                return False, f"{result} (gave up: the batch used up its {metrics.retry_budget} retries)"
+            self._add("retries", 1)
+            self._add("throttle_time", delay)
+            time.sleep(delay)
+
+        return False, f"{result} (gave up after {self.max_retries} retries)"
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "throttle_time": self.throttle_time,
+                "retries": self.retries,
+            }
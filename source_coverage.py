@@ -0,0 +1,136 @@
+"""
+Checks that the model's output actually covers the source chunk.
+
+Yiddish snippets in the output are compared with the chunk as normalized
+words: nikud and cantillation are stripped and punctuation is ignored, so
+"אַ" in the source matches "א" in a snippet. align_rows() maps every output
+row back to character offsets in the chunk; uncovered_spans() lists the
+parts of the chunk no row accounts for.
+"""
+import bisect
+import re
+import unicodedata
+
+NIKUD_RE = re.compile(r'[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]')
+WORD_RE = re.compile(r'\w+')
+
+MIN_GAP_CHARS = 8      # Normalized letters; smaller gaps are usually alignment noise
+SEARCH_WINDOW = 200    # How far past the previous row a reworded snippet may start
+MIN_ALIGNED_SHARE = 0.5 # Below this, the snippets don't resemble the source and gaps mean nothing
+ELLIPSES = ("...", "…")  # A snippet the model shortened (as the prompt's examples do)
+
+
+def normalize_words(text):
+    """Lists the words of text without nikud or punctuation."""
+    return WORD_RE.findall(NIKUD_RE.sub('', unicodedata.normalize('NFD', text)))
+
+
+def last_line_covered(chunk, snippets, lookback=3):
+    """
+    True if the second half of the chunk's last line shows up in one of the
+    last few output snippets. Short (1-2 letter) words are ignored since
+    they match almost anything.
+    """
+    lines = [line for line in chunk.split('\n') if line.strip()]
+    if not lines:
+        return True
+    words = [w for w in normalize_words(lines[-1]) if len(w) >= 3]
+    if not words:
+        return True
+
+    seen = {w for snippet in snippets[-lookback:] for w in normalize_words(snippet)}
+    return any(w in seen for w in words[len(words) // 2:])
+
+
+def normalized_index(text):
+    """
+    Returns (letters, offsets): text reduced to lower-case letters and digits
+    (no nikud, punctuation or spaces), and for each of those letters its
+    offset in the original text.
+    """
+    letters = []
+    offsets = []
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            continue
+        for c in NIKUD_RE.sub('', unicodedata.normalize('NFD', ch)):
+            if c.isalnum():
+                letters.append(c.lower())
+                offsets.append(i)
+    return "".join(letters), offsets
+
+
+def align_rows(chunk, snippets):
+    """
+    Maps each output snippet to the (start, end) character offsets of the
+    chunk it translates, or None if it can't be placed. Rows come in source
+    order, so each search starts where the previous row ended. A snippet the
+    model reworded slightly is placed by its first and last words. A
+    snippet ending in "..." covers the source up to the next row (or, for
+    the last row, to the end of its line).
+    """
+    norm, offsets = normalized_index(chunk)
+    spans = []
+    cursor = 0
+    for snippet in snippets:
+        key = normalized_index(snippet)[0]
+        if not key:
+            spans.append(None)
+            continue
+
+        pos = norm.find(key, cursor)
+        if pos == -1:
+            pos = norm.find(key) # Out of order
+        end = pos + len(key) if pos != -1 else -1
+
+        if pos == -1:
+            words = [w for w in (normalized_index(w)[0] for w in snippet.split()) if w]
+            pos = norm.find(words[0], cursor, cursor + SEARCH_WINDOW + len(key))
+            if pos != -1:
+                last = norm.rfind(words[-1], pos, pos + 2 * len(key))
+                end = last + len(words[-1]) if last != -1 else -1
+
+        if pos == -1 or end == -1:
+            spans.append(None)
+            continue
+        spans.append((offsets[pos], offsets[end - 1] + 1))
+        cursor = max(cursor, end)
+
+    for i, snippet in enumerate(snippets):
+        if spans[i] is None or not snippet.rstrip().endswith(ELLIPSES):
+            continue
+        start, end = spans[i]
+        following = [span[0] for span in spans[i + 1:] if span is not None and span[0] >= end][:1]
+        if following:
+            end = following[0]
+        else:
+            line_end = chunk.find("\n", end)
+            end = len(chunk) if line_end == -1 else line_end
+        spans[i] = (start, end)
+    return spans
+
+
+def uncovered_spans(chunk, spans, min_chars=MIN_GAP_CHARS):
+    """
+    (start, end) offsets of the stretches of chunk that none of the aligned
+    spans cover, ignoring gaps of fewer than min_chars letters. Returns []
+    when too few rows could be aligned for the answer to mean anything.
+    """
+    placed = sorted(s for s in spans if s is not None)
+    if not chunk.strip() or len(placed) < MIN_ALIGNED_SHARE * len(spans) or not placed:
+        return []
+
+    offsets = normalized_index(chunk)[1]
+    gaps = []
+    covered_to = 0
+    for start, end in placed + [(len(chunk), len(chunk))]:
+        if start > covered_to:
+            first = bisect.bisect_left(offsets, covered_to)
+            last = bisect.bisect_left(offsets, start) # Exclusive
+            if last - first >= min_chars:
+                gap_end = offsets[last - 1] + 1
+                while gap_end < len(chunk) and unicodedata.combining(chunk[gap_end]):
+                    gap_end += 1 # Keep the last letter's nikud
+                gaps.append((offsets[first], gap_end))
+        covered_to = max(covered_to, end)
+    return gaps
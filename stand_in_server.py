@@ -0,0 +1,309 @@
+"""
+Local stand-in for the Gemini API, for benchmarks and offline runs.
+
+Answers generateContent and streamGenerateContent (SSE) with canned
+pipe-format rows built from the request's own text: every source line is cut
+into short snippets, each with a placeholder English subtitle that meets the
+subtitle rules. JSON mode (responseMimeType) returns the same rows as
+ROWS_SCHEMA JSON, and subtitle repair requests get one fixed row per ID.
+Latency is drawn from a configurable distribution, and a share of requests
+can be answered with 429 (with a retry hint) or 503 instead. cachedContents
+can be created and deleted; requests that refer to one are answered as if
+its system instruction had been sent, and an optional prefill delay per 1k
+uncached prompt tokens shows what caching saves.
+
+    python stand_in_server.py --port 8765 --latency lognormal:0.8,0.4 --rate-429 0.05
+    GEMINI_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+TASK_RE = re.compile(r"TASK: Translate this text part \(\d+/\d+\):\n")
+REPAIR_MARKER = "ROWS TO FIX:\n"
+SNIPPET_WORDS = 6           # Source words per canned row
+STREAM_EVENTS = 8           # SSE events a streamed answer is split into
+MODELS = ["models/gemini-2.5-flash", "models/gemini-1.5-flash"]
+
+
+def parse_latency(spec):
+    """
+    Latency sampler from a spec: 'fixed:S', 'uniform:A,B',
+    'lognormal:MEDIAN,SIGMA' or 'exponential:MEAN' (seconds).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(*values)
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency spec: {spec!r}")
+
+
+def canned_rows(text):
+    """(yiddish, english) rows for a source text: SNIPPET_WORDS words per row."""
+    rows = []
+    for line in text.split("\n"):
+        words = line.split()
+        for start in range(0, len(words), SNIPPET_WORDS):
+            n = len(rows) + 1
+            rows.append((" ".join(words[start:start + SNIPPET_WORDS]), f"Subtitle {n}, first line~and the second"))
+    return rows
+
+
+def repair_rows(text):
+    """Fixed rows for a subtitle repair request ('ID | Yiddish | English' lines)."""
+    rows = []
+    for line in text.split("\n"):
+        parts = line.split("|")
+        if len(parts) >= 2 and parts[0].strip().isdigit():
+            rows.append((parts[0].strip(), parts[1].strip(), "A repaired subtitle line"))
+    return rows
+
+
+def request_text(body, cached_text=""):
+    """All text parts of a request body (system instruction and cached content's text included)."""
+    parts = [cached_text] if cached_text else []
+    for holder in [body.get("systemInstruction") or {}] + list(body.get("contents") or []):
+        parts += [part.get("text", "") for part in holder.get("parts", [])]
+    return "\n".join(parts)
+
+
+def build_answer(body, cached_text=""):
+    """The model's answer text for a generateContent body."""
+    text = request_text(body, cached_text)
+    json_output = (body.get("generationConfig") or {}).get("responseMimeType") == "application/json"
+
+    if REPAIR_MARKER in text:
+        rows = repair_rows(text.split(REPAIR_MARKER, 1)[1])
+        return "\n".join(f"{n} | {yiddish} | {english}" for n, yiddish, english in rows)
+
+    match = TASK_RE.search(text)
+    source = text[match.end():] if match else text
+    rows = canned_rows(source)
+    if json_output:
+        return json.dumps({"rows": [{"source": yiddish, "english_lines": english.split("~")}
+                                    for yiddish, english in rows]}, ensure_ascii=False)
+    header = "ID | Yiddish Snippet | English Subtitle\n--- | --- | ---\n"
+    return header + "\n".join(f"{n} | {yiddish} | {english}" for n, (yiddish, english) in enumerate(rows, 1))
+
+
+def usage(body, answer, cached_text=""):
+    prompt_chars = len(request_text(body, cached_text))
+    counts = {"promptTokenCount": prompt_chars // 3, "candidatesTokenCount": len(answer) // 3,
+              "totalTokenCount": (prompt_chars + len(answer)) // 3}
+    if cached_text:
+        counts["cachedContentTokenCount"] = len(cached_text) // 3
+    return counts
+
+
+class StandInServer:
+    """Threaded stand-in server; use as a context manager or call start()/stop()."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency="fixed:0", rate_429=0.0, rate_503=0.0,
+                 retry_after=0.5, seed=None, prefill_per_1k=0.0):
+        self.sample_latency = parse_latency(latency) if isinstance(latency, str) else latency
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.retry_after = retry_after
+        self.prefill_per_1k = prefill_per_1k
+        self.cached_contents = {} # name -> system instruction text
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "streamed": 0, "429": 0, "503": 0,
+                       "cache_created": 0, "cache_hits": 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _create_cache(self, body):
+        """Stores a cachedContents body's system instruction; returns its name."""
+        with self._lock:
+            name = f"cachedContents/stand-in-{len(self.cached_contents) + 1}"
+            self.cached_contents[name] = request_text({"systemInstruction": body.get("systemInstruction")})
+            self.counts["cache_created"] += 1
+        return name
+
+    def _draw(self):
+        """(fault or None, latency) for one request."""
+        with self._lock:
+            roll = self._rng.random()
+            latency = max(0.0, self.sample_latency(self._rng))
+        if roll < self.rate_429:
+            return "429", latency
+        if roll < self.rate_429 + self.rate_503:
+            return "503", latency
+        return None, latency
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, content_type="application/json", headers=()):
+                data = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if urlparse(self.path).path.rstrip("/") == "/v1beta/models":
+                    self._send(200, {"models": [
+                        {"name": name, "supportedGenerationMethods": ["generateContent", "streamGenerateContent"]}
+                        for name in MODELS
+                    ]})
+                else:
+                    self._send(404, {"error": {"code": 404, "message": "Not found"}})
+
+            def do_DELETE(self):
+                name = urlparse(self.path).path.removeprefix("/v1beta/")
+                with server._lock:
+                    found = server.cached_contents.pop(name, None) is not None
+                if found:
+                    self._send(200, {})
+                else:
+                    self._send(404, {"error": {"code": 404, "message": f"{name} not found"}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                path = urlparse(self.path).path
+                if path.rstrip("/") == "/v1beta/cachedContents":
+                    return self._send(200, {"name": server._create_cache(body), "model": body.get("model")})
+
+                server._count("requests")
+                cached_text = ""
+                if body.get("cachedContent"):
+                    with server._lock:
+                        cached_text = server.cached_contents.get(body["cachedContent"])
+                    if cached_text is None:
+                        return self._send(404, {"error": {"code": 404, "status": "NOT_FOUND",
+                                                          "message": "Cached content not found (stand-in)"}})
+                    server._count("cache_hits")
+                fault, latency = server._draw()
+                if fault == "429":
+                    server._count("429")
+                    time.sleep(min(latency, 0.05))
+                    return self._send(429, {"error": {
+                        "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Quota exceeded (stand-in)",
+                        "details": [{"retryDelay": f"{server.retry_after}s"}],
+                    }}, headers=[("Retry-After", str(server.retry_after))])
+                if fault == "503":
+                    server._count("503")
+                    time.sleep(latency / 2)
+                    return self._send(503, {"error": {"code": 503, "status": "UNAVAILABLE",
+                                                      "message": "Overloaded (stand-in)"}})
+
+                answer = build_answer(body, cached_text)
+                counts = usage(body, answer, cached_text)
+                uncached = counts["promptTokenCount"] - counts.get("cachedContentTokenCount", 0)
+                latency += server.prefill_per_1k * uncached / 1000
+                if path.endswith(":streamGenerateContent"):
+                    server._count("streamed")
+                    self._stream(answer, counts, latency)
+                else:
+                    time.sleep(latency)
+                    self._send(200, {
+                        "candidates": [{"content": {"parts": [{"text": answer}], "role": "model"},
+                                        "finishReason": "STOP"}],
+                        "usageMetadata": counts,
+                    })
+                server._count("ok")
+
+            def _stream(self, answer, counts, latency):
+                """Sends the answer as SSE events spread over the latency (first bytes after a third of it)."""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                step = max(1, math.ceil(len(answer) / STREAM_EVENTS))
+                pieces = [answer[i:i + step] for i in range(0, len(answer), step)] or [""]
+                time.sleep(latency / 3)
+                for n, piece in enumerate(pieces):
+                    event = {"candidates": [{"content": {"parts": [{"text": piece}], "role": "model"}}]}
+                    if n == len(pieces) - 1:
+                        event["candidates"][0]["finishReason"] = "STOP"
+                        event["usageMetadata"] = counts
+                    data = f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                    time.sleep(latency * 2 / 3 / len(pieces))
+                self.wfile.write(b"0\r\n\r\n")
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serves on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the Gemini API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:0.8,0.4",
+                        help="fixed:S, uniform:A,B, lognormal:MEDIAN,SIGMA or exponential:MEAN (seconds)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Seconds suggested with each 429")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.0,
+                        help="Extra seconds per 1k prompt tokens not served from cached content")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    server = StandInServer(args.host, args.port, args.latency, args.rate_429, args.rate_503,
+                           args.retry_after, args.seed, args.prefill_per_1k)
+    print(f"Gemini stand-in on {server.url} (set GEMINI_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,109 @@
+"""
+Cold-start report: how long the app's imports and first script runs take.
+
+Each measurement runs in a fresh interpreter, as on a container cold start.
+Imports are timed with python -X importtime (the slowest top-level modules
+are listed, and any heavy dependency that got loaded up front is flagged).
+If Streamlit's testing API is available, app.py is then run headless with
+AppTest: the first run (imports, cached resources, first paint) and a
+rerun. The app shows the same numbers for the live server in the sidebar's
+Startup box.
+
+    python startup_report.py
+    python startup_report.py --top 20 -o startup.json
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_MODULES = [
+    "streamlit", "translation_cache", "translation_memory", "scheduler", "chunker", "checkpoints",
+    "jobs", "pipeline", "row_store", "routing", "key_pool", "prompts", "ingest", "exporters",
+    "subtitle_rules", "metrics", "styles",
+]
+DEFERRED = ["docx", "pandas"] # Only needed on first use; loading them at startup is a regression
+
+APP_TEST_SCRIPT = """
+import json, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=60)
+started = time.perf_counter()
+at.run()
+first = time.perf_counter() - started
+started = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - started
+print(json.dumps({"first_run": first, "rerun": rerun, "exceptions": [str(e.value) for e in at.exception]}))
+"""
+
+
+def python(args, code):
+    """Runs code in a fresh interpreter from the app's directory; returns the completed process."""
+    return subprocess.run([sys.executable, *args, "-c", code], cwd=APP_DIR, capture_output=True, text=True)
+
+
+def import_times(modules):
+    """
+    (total seconds, {module: seconds}, names of all loaded modules) for
+    importing modules in order. A module imported by an earlier one is
+    counted in that one's time.
+    """
+    code = f"import sys\nfor name in {modules!r}:\n    __import__(name)\nprint(' '.join(sys.modules))"
+    done = python(["-X", "importtime"], code)
+    if done.returncode != 0:
+        raise RuntimeError(done.stderr.strip().splitlines()[-1])
+    top_level = {}
+    for line in done.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "): # Imported directly, not by another module
+            top_level[name.strip()] = int(cumulative) / 1e6
+    top_level = {name: seconds for name, seconds in top_level.items() if name in modules}
+    return sum(top_level.values()), top_level, set(done.stdout.split())
+
+
+def app_runs():
+    """First-run and rerun seconds of app.py under AppTest, or None if Streamlit can't run it here."""
+    done = python([], APP_TEST_SCRIPT)
+    if done.returncode != 0:
+        return None
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the app's import and first-run times.")
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list")
+    parser.add_argument("--no-app-run", action="store_true", help="Only time the imports")
+    parser.add_argument("-o", "--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    available = [name for name in APP_MODULES if importlib.util.find_spec(name) is not None]
+    total, top_level, loaded = import_times(available)
+    slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    report = {
+        "python": sys.version.split()[0],
+        "imports": {
+            "seconds": round(total, 4),
+            "missing": [name for name in APP_MODULES if name not in available],
+            "slowest": {name: round(seconds, 4) for name, seconds in slowest},
+            "deferred_loaded_at_startup": [name for name in DEFERRED if name in loaded],
+        },
+        "app": None if args.no_app_run else app_runs(),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 1 if report["imports"]["deferred_loaded_at_startup"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+"""
+Stylesheet for the app (a module, so it is built once per server process
+rather than on every rerun).
+"""
+
+APP_CSS = """
+<style>
+    /* IMPORT HEBREW FONTS */
+    @import url('https://fonts.googleapis.com/css2?family=Frank+Ruhl+Libre:wght@400;700&family=Alef:wght@400;700&display=swap');
+
+    /* MAIN BACKGROUND */
+    .stApp {
+        background-color: #FDFBF7;
+        color: #4A3B32;
+    }
+
+    /* SIDEBAR BACKGROUND */
+    section[data-testid="stSidebar"] {
+        background-color: #F3F0E6;
+        border-right: 1px solid #E0DACC;
+    }
+
+    /* HEADERS */
+    h1, h2, h3, h4, .stMarkdown {
+        color: #4A3B32 !important;
+        font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif;
+    }
+    
+    /* PRIMARY BUTTON (TRANSLATE) */
+    div.stButton > button[kind="primary"] {
+        background: linear-gradient(135deg, #A67C52 0%, #8B5A2B 100%);
+        color: white !important;
+        border: none;
+        border-radius: 8px;
+        padding: 0.6rem 1.5rem;
+        font-weight: 600;
+        box-shadow: 0 4px 6px rgba(139, 90, 43, 0.2);
+        transition: all 0.3s ease;
+    }
+    
+    div.stButton > button[kind="primary"]:hover {
+        background: linear-gradient(135deg, #8B5A2B 0%, #6F4E37 100%);
+        box-shadow: 0 6px 8px rgba(139, 90, 43, 0.3);
+        transform: translateY(-1px);
+    }
+    
+    /* SECONDARY BUTTON (CLEAR) */
+    div.stButton > button[kind="secondary"] {
+        background-color: #FFFFFF !important;
+        border: 2px solid #8B5A2B !important;
+        color: #8B5A2B !important;
+        font-weight: bold !important;
+        border-radius: 8px;
+        transition: all 0.3s ease;
+    }
+    
+    div.stButton > button[kind="secondary"]:hover {
+        background-color: #F3F0E6 !important;
+        color: #6F4E37 !important;
+        border-color: #6F4E37 !important;
+    }
+
+    /* INPUT TEXT AREA */
+    .stTextArea textarea {
+        background-color: #FFFFFF;
+        border: 1px solid #D7D0C0;
+        border-radius: 8px;
+        color: #333333;
+        box-shadow: inset 0 2px 4px rgba(0,0,0,0.02);
+    }
+    
+    /* FILE UPLOADER STYLE */
+    [data-testid='stFileUploader'] {
+        margin-bottom: 10px;
+    }
+    [data-testid='stFileUploader'] section {
+        background-color: #FFF;
+        border: 1px dashed #A67C52;
+    }
+
+    /* --- LOADING STEPS STYLING --- */
+    .step-box {
+        background-color: #FFF;
+        border: 1px solid #E0DACC;
+        border-radius: 8px;
+        padding: 20px;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.05);
+        margin-bottom: 20px;
+    }
+    .step-item {
+        font-family: 'Helvetica Neue', sans-serif;
+        font-size: 1.05em;
+        padding: 8px 0;
+        color: #888;
+        display: flex;
+        align-items: center;
+        transition: color 0.3s ease;
+    }
+    .step-item.active {
+        color: #8B5A2B;
+        font-weight: bold;
+    }
+    .step-item.done {
+        color: #2E7D32; /* Green */
+        font-weight: bold;
+    }
+    .step-icon {
+        margin-right: 12px;
+        width: 20px;
+        display: inline-block;
+        text-align: center;
+    }
+
+    /* --- TABLE STYLING --- */
+    .results-table {
+        width: 100%;
+        border-collapse: collapse;
+        margin-top: 20px;
+        background-color: #FFF;
+        border-radius: 8px;
+        overflow: hidden;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.05);
+        border: 1px solid #E0DACC;
+    }
+    .results-table th {
+        background-color: #EBE5D5;
+        color: #4A3B32;
+        padding: 12px 15px;
+        text-align: left;
+        font-weight: bold;
+        border-bottom: 2px solid #D7D0C0;
+        font-size: 0.95em;
+        text-transform: uppercase;
+        letter-spacing: 0.5px;
+    }
+    .results-table td {
+        padding: 12px 15px;
+        border-bottom: 1px solid #F0EAE0;
+        vertical-align: top; 
+        color: #333;
+    }
+    .results-table tr:last-child td {
+        border-bottom: none;
+    }
+    .results-table tr:hover {
+        background-color: #FAF8F2;
+    }
+    .results-table tr.highlight {
+        background-color: #FFF3C4;
+    }
+    .id-col { width: 50px; color: #8B5A2B; font-weight: bold; font-size: 0.85em; text-align: center; }
+    .yiddish-col { font-family: 'Frank Ruhl Libre', 'Alef', serif; font-size: 1.3em; direction: rtl; text-align: right; color: #222; width: 45%; line-height: 1.5; }
+    .english-col { font-family: 'Helvetica Neue', Helvetica, Arial, sans-serif; font-size: 1.05em; line-height: 1.5; width: 45%; color: #111; }
+</style>
+"""
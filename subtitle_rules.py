@@ -0,0 +1,140 @@
+"""
+Checks translated rows against the subtitle rules of the prompt (Module E)
+and repairs the ones that break them.
+
+A row fails if its English is empty, a line is over MAX_LINE_CHARS, it has
+more than MAX_LINES lines, or its two lines are badly out of balance (a
+break after a clause, like "**Moses reasoned:**~...", may be more uneven
+than one mid-phrase). Most of these are fixed locally by re-breaking the
+text at the best word boundary; only rows that still fail are sent back to
+the model, all in one small request.
+"""
+import re
+
+MAX_LINE_CHARS = 42
+MAX_LINES = 2
+MIN_BALANCE = 0.5 # Shorter line / longer line, for two-line rows
+MIN_CLAUSE_BALANCE = 0.3 # The same, when the first line ends a clause
+
+CLAUSE_END_RE = re.compile(r'[,;:.!?–—]["\'”*]*$')
+
+PROBLEM_LABELS = {
+    "empty": "No English",
+    "too_long": f"Line over {MAX_LINE_CHARS} characters",
+    "too_many_lines": f"More than {MAX_LINES} lines",
+    "unbalanced": "Lines very uneven",
+}
+
+
+def visible_len(text):
+    """Length as shown on screen (bold markers don't count)."""
+    return len(text.replace("**", ""))
+
+
+def check_row(english):
+    """Lists the rule problems of one row's English ('~' marks line breaks); [] if it's fine."""
+    if not english.replace("~", "").strip():
+        return ["empty"]
+    lines = [line.strip() for line in english.split("~")]
+    problems = []
+    if any(visible_len(line) > MAX_LINE_CHARS for line in lines):
+        problems.append("too_long")
+    if len(lines) > MAX_LINES:
+        problems.append("too_many_lines")
+    if len(lines) == 2:
+        shorter, longer = sorted(visible_len(line) for line in lines)
+        min_balance = MIN_CLAUSE_BALANCE if CLAUSE_END_RE.search(lines[0]) else MIN_BALANCE
+        if shorter < min_balance * longer:
+            problems.append("unbalanced")
+    return problems
+
+
+def _close_bold(first, second):
+    """Keeps **bold** spans that cross the break closed on both lines."""
+    if first.count("**") % 2:
+        return first + "**", "**" + second
+    return first, second
+
+
+def rebreak(english):
+    """
+    Re-breaks a row's English into one line, or two balanced lines, of at
+    most MAX_LINE_CHARS. Prefers breaking after a clause. Returns None if
+    the text can't fit in two lines.
+    """
+    words = english.replace("~", " ").split()
+    if not words:
+        return None
+    text = " ".join(words)
+    if visible_len(text) <= MAX_LINE_CHARS:
+        return text
+
+    best = None
+    for k in range(1, len(words)):
+        first, second = _close_bold(" ".join(words[:k]), " ".join(words[k:]))
+        a, b = visible_len(first), visible_len(second)
+        if a > MAX_LINE_CHARS or b > MAX_LINE_CHARS:
+            continue
+        score = abs(a - b) - (8 if CLAUSE_END_RE.search(words[k - 1]) else 0)
+        if best is None or score < best[0]:
+            best = (score, f"{first}~{second}")
+    if best is None:
+        return None
+    fixed = best[1]
+    return fixed if not check_row(fixed) else None
+
+
+def build_repair_task(rows):
+    """Request text for the model: one 'ID | Yiddish | English' line per (id, yiddish, english)."""
+    lines = [f"{row_id} | {yiddish} | {english}" for row_id, yiddish, english in rows]
+    return "ROWS TO FIX:\n" + "\n".join(lines)
+
+
+def parse_repair_reply(reply):
+    """Maps row ID -> English from the model's 'ID | ... | English' reply lines."""
+    fixed = {}
+    for line in reply.split("\n"):
+        parts = line.split("|")
+        if len(parts) >= 2 and parts[0].strip().isdigit():
+            fixed[int(parts[0].strip())] = parts[-1].strip()
+    return fixed
+
+
+def repair_rows(pairs, request_repair=None):
+    """
+    Validates (yiddish, english) pairs and fixes what it can. Rows that the
+    local re-breaker can't fix are sent in one request_repair(task_text) ->
+    (success, reply) call. Returns (pairs, summary) where summary counts
+    'flagged', 'fixed_locally' and 'fixed_by_model' rows and lists the
+    'still_failing' ones as (index, yiddish, english, problems).
+    """
+    pairs = list(pairs)
+    summary = {"flagged": 0, "fixed_locally": 0, "fixed_by_model": 0, "still_failing": []}
+    failing = []
+    for i, (yiddish, english) in enumerate(pairs):
+        if not check_row(english):
+            continue
+        summary["flagged"] += 1
+        fixed = rebreak(english)
+        if fixed is not None:
+            pairs[i] = (yiddish, fixed)
+            summary["fixed_locally"] += 1
+        else:
+            failing.append(i)
+
+    if failing and request_repair is not None:
+        success, reply = request_repair(build_repair_task(
+            (n, pairs[i][0], pairs[i][1]) for n, i in enumerate(failing, 1)
+        ))
+        replies = parse_repair_reply(reply) if success else {}
+        for n, i in enumerate(failing, 1):
+            english = replies.get(n, "")
+            if check_row(english):
+                english = rebreak(english) or ""
+            if english and not check_row(english):
+                pairs[i] = (pairs[i][0], english)
+                summary["fixed_by_model"] += 1
+        failing = [i for i in failing if check_row(pairs[i][1])]
+
+    summary["still_failing"] = [(i, pairs[i][0], pairs[i][1], check_row(pairs[i][1])) for i in failing]
+    return pairs, summary
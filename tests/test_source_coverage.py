@@ -0,0 +1,67 @@
+from pipeline import MAX_GAPS, fill_coverage_gaps
+from source_coverage import align_rows, uncovered_spans
+
+# Example 1 of the system prompt: row 001 shortens its snippet with "..."
+EXAMPLE_1_SOURCE = (
+    "וואָרום אף על פי וואָס דער שחרור פון דעם אַלטן רבי'ן איז געווען ביום י\"ט כסלו, "
+    "איז דאָך געווען כמה סיבות וואָס דערפאַר האָט זיך פאַרהאַלטן"
+)
+EXAMPLE_1_OUTPUT = (
+    "001 | וואָרום אף על פי וואָס דער שחרור... | And yes, **the Alter Rebbe**~was technically released on the 19th.\n"
+    "002 | איז דאָך געווען כמה סיבות וואָס דערפאַר האָט זיך פאַרהאַלטן | However, due to various reasons,~he was detained."
+)
+
+
+def test_elided_snippet_covers_up_to_next_row():
+    snippets = ["וואָרום אף על פי וואָס דער שחרור...", "איז דאָך געווען כמה סיבות וואָס דערפאַר האָט זיך פאַרהאַלטן"]
+    spans = align_rows(EXAMPLE_1_SOURCE, snippets)
+    assert spans[0][1] == spans[1][0]
+    assert uncovered_spans(EXAMPLE_1_SOURCE, spans) == []
+
+
+def test_elided_snippet_is_not_translated_again():
+    def translate_span(text):
+        raise AssertionError(f"Re-requested covered text: {text!r}")
+
+    gaps = []
+    assert fill_coverage_gaps(EXAMPLE_1_SOURCE, EXAMPLE_1_OUTPUT, translate_span, gaps=gaps) == EXAMPLE_1_OUTPUT
+    assert gaps == []
+
+
+def test_real_gap_is_still_found():
+    source = "ערשטע שורה מיט א סך ווערטער\nא שורה וואס דער מאדעל האט איבערגעהיפט\nדריטע שורה"
+    spans = align_rows(source, ["ערשטע שורה מיט א סך ווערטער", "דריטע שורה"])
+    gaps = uncovered_spans(source, spans)
+    assert [source[start:end] for start, end in gaps] == ["א שורה וואס דער מאדעל האט איבערגעהיפט"]
+
+
+def test_gaps_are_requested_together_and_spliced_in_place():
+    source = "\n".join(["ערשטע שורה מיט א סך ווערטער", "צווייטע שורה וואס איז איבערגעהיפט",
+                        "דריטע שורה מיט נאך ווערטער", "פערטע שורה וואס איז אויך פארלוירן",
+                        "פינפטע שורה צום סוף"])
+    result = ("1 | ערשטע שורה מיט א סך ווערטער | One\n"
+              "2 | דריטע שורה מיט נאך ווערטער | Three\n"
+              "3 | פינפטע שורה צום סוף | Five")
+    requests = []
+
+    def translate_span(text):
+        requests.append(text)
+        return True, "1 | צווייטע שורה וואס איז איבערגעהיפט | Two\n2 | פערטע שורה וואס איז אויך פארלוירן | Four"
+
+    gaps = []
+    merged = fill_coverage_gaps(source, result, translate_span, gaps=gaps)
+    assert len(requests) == 1
+    assert [line.split(" | ")[2] for line in merged.split("\n")] == ["One", "Two", "Three", "Four", "Five"]
+    assert [gap["filled"] for gap in gaps] == [True, True]
+
+
+def test_too_many_gaps_are_only_reported():
+    lines = [f"שורה נומער {n} מיט גענוג ווערטער" for n in range(1, 3 * (MAX_GAPS + 2))]
+    result = "\n".join(f"{n} | {line} | Line" for n, line in enumerate(lines[::3], 1))
+
+    def translate_span(text):
+        raise AssertionError("Gaps past MAX_GAPS must not be requested")
+
+    gaps = []
+    assert fill_coverage_gaps("\n".join(lines), result, translate_span, gaps=gaps) == result
+    assert len(gaps) > MAX_GAPS and not any(gap["filled"] for gap in gaps)
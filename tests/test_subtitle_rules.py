@@ -0,0 +1,29 @@
+from subtitle_rules import check_row, rebreak, repair_rows
+
+# The English of the system prompt's few-shot examples
+PROMPT_EXAMPLES = [
+    "And yes, **the Alter Rebbe**~was technically released on the 19th.",
+    "However, due to various reasons,~he was detained.",
+    "One waits until he~\"returns to full health.\"",
+    "Only then is the recovery complete.",
+    "**Moses reasoned:**~\"If that person acts this way...\"",
+]
+
+
+def test_prompt_examples_pass():
+    for english in PROMPT_EXAMPLES:
+        assert check_row(english) == [], english
+
+
+def test_prompt_examples_are_left_alone():
+    pairs = [("", english) for english in PROMPT_EXAMPLES]
+    fixed, summary = repair_rows(pairs)
+    assert fixed == pairs
+    assert summary["flagged"] == 0
+
+
+def test_uneven_break_mid_phrase_is_rebroken():
+    english = "If that~person acts this way, he will regret it"
+    assert check_row(english) == ["unbalanced"]
+    fixed = rebreak(english)
+    assert fixed is not None and check_row(fixed) == []
@@ -0,0 +1,122 @@
+"""
+On-disk cache for translated chunks.
+
+Each entry is keyed by a hash of (model name, system prompt, chunk text), so
+re-translating an unchanged transcript costs zero API calls. Entries are
+evicted by age and by total count / size (least recently used first).
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "SUBTITLE_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "sicha-subtitles")
+)
+
+
+def make_key(model_name, system_prompt, chunk):
+    """Content hash for one (model, prompt, chunk) combination."""
+    h = hashlib.sha256()
+    for part in (model_name, system_prompt, chunk):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")  # Separator, so ("ab", "c") != ("a", "bc")
+    return h.hexdigest()
+
+
+class TranslationCache:
+    """Thread-safe SQLite cache of chunk translations."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=20000,
+                 max_bytes=200 * 1024 * 1024, max_age_days=30):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "translations.sqlite3")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 3600
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_evict = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries (accessed)")
+            self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        """Returns the cached text, or None on a miss (expired entries count as misses)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now)
+            )
+            self._conn.commit()
+            self._writes_since_evict += 1
+            due = self._writes_since_evict >= 100
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then least recently used ones until under the limits."""
+        with self._lock:
+            self._writes_since_evict = 0
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.max_age,))
+
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            if count > self.max_entries or total > self.max_bytes:
+                excess_count = max(0, count - self.max_entries)
+                excess_bytes = max(0, total - self.max_bytes)
+                doomed = []
+                for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                    if excess_count <= 0 and excess_bytes <= 0:
+                        break
+                    doomed.append((key,))
+                    excess_count -= 1
+                    excess_bytes -= size
+                self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total}
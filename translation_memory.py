@@ -0,0 +1,262 @@
+"""
+Translation memory built from past jobs.
+
+Every translated batch is broken back down into (Yiddish, English) rows,
+both per output row and per whole source line, and stored in SQLite. A
+source line whose normalized text exactly matches a stored line reuses its
+rows without an API call; lines that only resemble stored text (the same
+citation, honorific or stock phrase in different surroundings) pull those
+rows into the batch prompt as hints, so terminology stays consistent.
+
+Near-duplicates are found with MinHash over character 3-grams, bucketed
+into LSH bands. An entry's band keys are computed once, when it is learned,
+and indexed in SQLite next to it, so opening the memory costs nothing: a
+lookup hashes the query once and only compares against entries that share
+a band (at most MAX_CANDIDATES of them).
+"""
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from source_coverage import align_rows, normalize_words
+from translation_cache import DEFAULT_CACHE_DIR
+
+SHINGLE_SIZE = 3
+NUM_BANDS = 8
+ROWS_PER_BAND = 2           # 16 hashes; pairs above ~0.35 Jaccard usually share a band
+MIN_WORDS = 3               # Shorter snippets match too much to be useful
+HINT_THRESHOLD = 0.5        # Jaccard similarity for a stored entry to become a hint
+WINDOW_WORDS = 8            # Long lines are also searched in windows of this many words
+MAX_BUCKET_CANDIDATES = 50  # Bands with more entries (stock phrases) are only used if no other band matches
+MAX_CANDIDATES = 20         # Entries scored per lookup, those sharing the most bands
+SCHEMA_VERSION = 1          # 1: band keys stored in SQLite
+
+_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (1 + 2 * zlib.crc32(f"a{i}".encode()), zlib.crc32(f"b{i}".encode()))
+    for i in range(NUM_BANDS * ROWS_PER_BAND)
+]
+
+
+def normalize(text):
+    """Comparison form of a snippet: its words without nikud or punctuation, lower-cased."""
+    return " ".join(normalize_words(text)).lower()
+
+
+def shingles(key):
+    """Hashed character n-grams of a normalized key."""
+    padded = f" {key} "
+    return {zlib.crc32(padded[i:i + SHINGLE_SIZE].encode("utf-8"))
+            for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+
+
+def minhash(shingle_set):
+    return [min((a * h + b) % _PRIME for h in shingle_set) for a, b in _PERMUTATIONS]
+
+
+def band_keys(signature):
+    """One signed 64-bit key (an SQLite INTEGER) per LSH band of a signature."""
+    keys = []
+    for band in range(NUM_BANDS):
+        values = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(repr((band, values)).encode("ascii"), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def entry_band_keys(key):
+    return band_keys(minhash(shingles(key)))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def rows_by_line(chunk, rows):
+    """
+    Groups aligned rows under the source line they translate: (line, rows)
+    for every line that its rows cover exactly, word for word.
+    """
+    spans = align_rows(chunk, [yiddish for yiddish, _ in rows])
+    grouped = []
+    start = 0
+    for line in chunk.split("\n"):
+        end = start + len(line)
+        line_rows = [row for row, span in zip(rows, spans)
+                     if span is not None and start <= span[0] and span[1] <= end]
+        if line_rows and normalize(" ".join(y for y, _ in line_rows)) == normalize(line):
+            grouped.append((line, line_rows))
+        start = end + 1
+    return grouped
+
+
+class TranslationMemory:
+    """Thread-safe SQLite store of past translations with an exact and a MinHash (LSH) index."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=100_000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "memory.sqlite3")
+        self.max_entries = max_entries
+        self.reused_lines = 0
+        self.hints_given = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS segments (
+                    key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    rows TEXT NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS bands (
+                    band_key INTEGER NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (band_key, key)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bands_by_key ON bands (key)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS segments_by_age ON segments (updated)")
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                # Memories from before the band index: hash their entries once
+                keys = [key for (key,) in self._conn.execute("SELECT key FROM segments")]
+                self._conn.executemany("INSERT OR IGNORE INTO bands (band_key, key) VALUES (?, ?)",
+                                       [(band_key, key) for key in keys for band_key in entry_band_keys(key)])
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.commit()
+
+    def learn(self, chunk, rows):
+        """Stores a translated chunk's rows, one entry per row and per fully covered source line."""
+        segments = [(yiddish, [(yiddish, english)]) for yiddish, english in rows]
+        segments += rows_by_line(chunk, rows)
+        now = time.time()
+        records = {}
+        for source, seg_rows in segments:
+            key = normalize(source)
+            if len(key.split()) < MIN_WORDS or not all(english for _, english in seg_rows):
+                continue
+            records[key] = (key, source, json.dumps(seg_rows, ensure_ascii=False), now)
+        band_records = [(band_key, key) for key in records for band_key in entry_band_keys(key)]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO segments (key, source, rows, updated) VALUES (?, ?, ?, ?)",
+                list(records.values())
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO bands (band_key, key) VALUES (?, ?)", band_records)
+            # Keep the most recently seen entries
+            excess = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0] - self.max_entries
+            if excess > 0:
+                old = self._conn.execute("SELECT key FROM segments ORDER BY updated LIMIT ?", (excess,)).fetchall()
+                self._conn.executemany("DELETE FROM segments WHERE key = ?", old)
+                self._conn.executemany("DELETE FROM bands WHERE key = ?", old)
+            self._conn.commit()
+
+    def exact(self, text):
+        """Stored rows for text (compared normalized), or None."""
+        key = normalize(text)
+        if len(key.split()) < MIN_WORDS:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT rows FROM segments WHERE key = ?", (key,)).fetchone()
+        return [tuple(r) for r in json.loads(row[0])] if row else None
+
+    def split_known(self, chunk):
+        """
+        Separates the chunk's lines that the memory already has. Returns
+        (remainder, known): the other lines joined back together, and
+        (offset in chunk, rows) for every known line.
+        """
+        remainder = []
+        known = []
+        start = 0
+        for line in chunk.split("\n"):
+            rows = self.exact(line) if line.strip() else None
+            if rows:
+                known.append((start, rows))
+            else:
+                remainder.append(line)
+            start += len(line) + 1
+        with self._lock:
+            self.reused_lines += len(known)
+        return "\n".join(remainder), known
+
+    def similar(self, text, threshold=HINT_THRESHOLD):
+        """Stored (source, rows, similarity) entries resembling text, best first."""
+        key = normalize(text)
+        if len(key.split()) < MIN_WORDS:
+            return []
+        shingle_set = shingles(key)
+        query_bands = band_keys(minhash(shingle_set))
+        shared = collections.Counter()
+        crowded = []
+        with self._lock:
+            for band_key in query_bands:
+                keys = [k for (k,) in self._conn.execute(
+                    "SELECT key FROM bands WHERE band_key = ? LIMIT ?", (band_key, MAX_BUCKET_CANDIDATES + 1)
+                )]
+                if len(keys) > MAX_BUCKET_CANDIDATES:
+                    crowded.append(keys[:MAX_BUCKET_CANDIDATES]) # A stock phrase: says little about the match
+                else:
+                    shared.update(keys)
+            if not shared:
+                for keys in crowded:
+                    shared.update(keys)
+            best = [k for k, _ in shared.most_common(MAX_CANDIDATES)]
+            entries = self._conn.execute(
+                f"SELECT key, source, rows FROM segments WHERE key IN ({','.join('?' * len(best))})", best
+            ).fetchall() if best else []
+
+        # Scored outside the lock, so parallel batches don't queue behind each other
+        scored = [(jaccard(shingle_set, shingles(k)), source, rows) for k, source, rows in entries]
+        return [(source, [tuple(r) for r in json.loads(rows)], score)
+                for score, source, rows in sorted(scored, key=lambda item: -item[0]) if score >= threshold]
+
+    def hints(self, text, limit=8):
+        """
+        Rows of stored entries that resemble lines (or 8-word windows of long
+        lines) of text. Returns up to limit (yiddish, english) rows.
+        """
+        found = {}
+        for line in text.split("\n"):
+            words = line.split()
+            pieces = [line]
+            if len(words) > 2 * WINDOW_WORDS:
+                step = WINDOW_WORDS // 2
+                pieces += [" ".join(words[i:i + WINDOW_WORDS]) for i in range(0, len(words) - step, step)]
+            for piece in pieces:
+                for source, rows, score in self.similar(piece):
+                    if score > found.get(source, (0, None))[0]:
+                        found[source] = (score, rows)
+        best = sorted(found.values(), key=lambda item: -item[0])
+        hint_rows = []
+        for _, rows in best:
+            for row in rows:
+                if row not in hint_rows:
+                    hint_rows.append(row)
+        hint_rows = hint_rows[:limit]
+        with self._lock:
+            self.hints_given += len(hint_rows)
+        return hint_rows
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM segments")
+            self._conn.execute("DELETE FROM bands")
+            self._conn.commit()
+            self.reused_lines = 0
+            self.hints_given = 0
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            return {"entries": entries, "reused_lines": self.reused_lines, "hints": self.hints_given}